@@ -2,7 +2,7 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count, Q
 from users.models import Employee
-from onboarding.models import OnboardingTask, EmployeeOnboarding
+from onboarding.progress import top_progress
 from vacations.models import VacationRequest
 from datetime import datetime, timedelta
 from django.utils import timezone
@@ -37,28 +37,8 @@ def dashboard(request):
         end_date__gte=today
     ).count()
     
-    # Прогресс онбординга
-    total_tasks = OnboardingTask.objects.count()
-    employees_progress = []
-    
-    for emp in Employee.objects.filter(is_active=True)[:10]:  # топ-10
-        if total_tasks > 0:
-            completed = EmployeeOnboarding.objects.filter(
-                employee=emp, is_completed=True
-            ).count()
-            progress = int((completed / total_tasks) * 100)
-        else:
-            progress = 0
-        
-        employees_progress.append({
-            'name': emp.name,
-            'progress': progress,
-            'completed': completed,
-            'total': total_tasks,
-        })
-    
-    # Сортируем по прогрессу
-    employees_progress.sort(key=lambda x: x['progress'], reverse=True)
+    # Прогресс онбординга: топ-10 по прогрессу, отсортированный в БД
+    employees_progress = top_progress(limit=10)
     
     context = {
         'total_employees': total_employees,
@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import BitrixOutbox
 
-# Register your models here.
+
+@admin.register(BitrixOutbox)
+class BitrixOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'bitrix_user_id', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['idempotency_key', 'bitrix_user_id']
+    readonly_fields = ['created_at', 'updated_at', 'sent_at', 'result']
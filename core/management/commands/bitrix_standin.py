@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from core.services.bitrix_standin import BitrixStandIn, make_server
+import time
+
+
+class Command(BaseCommand):
+    help = 'Локальная замена REST API Битрикс24 с синтетическим справочником (для нагрузочных тестов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--users', type=int, default=100_000, help='Сколько сотрудников сгенерировать')
+        parser.add_argument('--departments', type=int, default=200, help='Сколько отделов сгенерировать')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора (одинаковый справочник между запусками)')
+        parser.add_argument('--latency-ms', type=float, default=0, help='Задержка ответа на каждый запрос, мс')
+        parser.add_argument('--rate-limit', type=float, default=2,
+                            help='Запросов в секунду до QUERY_LIMIT_EXCEEDED (0 — без лимита)')
+        parser.add_argument('--burst', type=int, default=50, help='Запас запросов сверх лимита')
+        parser.add_argument('--error-rate', type=float, default=0, help='Доля случайных ответов 503')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        standin = BitrixStandIn(
+            users=options['users'],
+            departments=options['departments'],
+            seed=options['seed'],
+            latency=options['latency_ms'] / 1000,
+            rate_limit=options['rate_limit'] or None,
+            burst=options['burst'],
+            error_rate=options['error_rate'],
+        )
+        self.stdout.write(
+            f"Сгенерировано {len(standin.ids)} сотрудников и {len(standin.departments)} отделов "
+            f"за {time.monotonic() - started:.1f} с"
+        )
+
+        server = make_server(standin, options['host'], options['port'])
+        webhook = f"http://{options['host']}:{options['port']}/rest/1/standin/"
+        self.stdout.write(self.style.SUCCESS(f'Стенд Битрикс24 слушает {webhook}'))
+        self.stdout.write(f'Пример: python manage.py sync_users --real --webhook {webhook}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Обработано запросов: {standin.stats['requests']}, "
+                              f"отклонено по лимиту: {standin.stats['rejected']}, "
+                              f"команд в batch: {standin.stats['batch_commands']}")
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from core.services.bitrix import get_bitrix_api
+from core.services.outbox import deliver_pending
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Фоновая отправка очереди вызовов Битрикс24 (события календаря, уведомления)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--webhook', type=str, help='Bitrix24 webhook URL (опционально)')
+        parser.add_argument('--real', action='store_true', help='Использовать реальный API (если не указан, то заглушка)')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь один раз и выйти')
+        parser.add_argument('--interval', type=float, default=5, help='Пауза между проходами при пустой очереди, с')
+        parser.add_argument('--limit', type=int, default=500, help='Сколько записей забирать за проход')
+
+    def handle(self, *args, **options):
+        bitrix = get_bitrix_api(webhook_url=options.get('webhook'), force_mock=not options.get('real'))
+        self.stdout.write('Воркер очереди Битрикс24 запущен')
+
+        try:
+            while True:
+                try:
+                    stats = deliver_pending(bitrix, limit=options['limit'])
+                except Exception:
+                    logger.exception("Outbox worker error")
+                    stats = {'sent': 0, 'retry': 0, 'failed': 0}
+
+                if any(stats.values()):
+                    self.stdout.write(
+                        f"Отправлено {stats['sent']}, на повтор {stats['retry']}, с ошибкой {stats['failed']}"
+                    )
+                if options['once']:
+                    break
+                # Полная пачка — очередь, скорее всего, еще не пуста
+                if sum(stats.values()) < options['limit']:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер остановлен')
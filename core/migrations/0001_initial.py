@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BitrixOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('calendar_event', 'Событие в календаре'), ('notification', 'Уведомление')], max_length=30, verbose_name='Тип')),
+                ('bitrix_user_id', models.IntegerField(verbose_name='ID пользователя в Битрикс24')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True, verbose_name='Ключ идемпотентности')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Ответ Битрикс24')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+            ],
+            options={
+                'verbose_name': 'Исходящий вызов Битрикс24',
+                'verbose_name_plural': 'Очередь вызовов Битрикс24',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='core_bitrix_status_a7cb1e_idx')],
+            },
+        ),
+    ]
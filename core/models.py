@@ -1,10 +1,45 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+
 class TimeStampedModel(models.Model):
     """Абстрактная модель с датами создания и обновления"""
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+
+class BitrixOutbox(TimeStampedModel):
+    """Исходящий вызов Битрикс24, записанный в одной транзакции с бизнес-изменением"""
+
+    KIND_CHOICES = [
+        ('calendar_event', 'Событие в календаре'),
+        ('notification', 'Уведомление'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="Тип")
+    bitrix_user_id = models.IntegerField(verbose_name="ID пользователя в Битрикс24")
+    payload = models.JSONField(default=dict, verbose_name="Данные")
+    idempotency_key = models.CharField(max_length=100, unique=True, verbose_name="Ключ идемпотентности")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    result = models.JSONField(null=True, blank=True, verbose_name="Ответ Битрикс24")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+        verbose_name = "Исходящий вызов Битрикс24"
+        verbose_name_plural = "Очередь вызовов Битрикс24"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} для {self.bitrix_user_id} ({self.get_status_display()})"
@@ -1,12 +1,177 @@
 import requests
+import json
 import logging
+import os
 import random
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib.parse import parse_qsl, urlencode
 from django.conf import settings
-from typing import Dict, List, Optional, Any
+from django.core.signals import setting_changed
+from typing import Dict, Iterator, List, Optional, Any
 from datetime import datetime
+from core.services.bitrix_params import filter_users, unflatten_params
+from core.services.resilience import CircuitBreaker, TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Bitrix отдает списки страницами по 50 записей
+PAGE_SIZE = 50
+# Максимум команд в одном вызове batch
+BATCH_LIMIT = 50
+
+
+def _flatten_params(params: Dict, prefix: str = '') -> List[tuple]:
+    """Развернуть вложенные параметры в пары ключ-значение (как http_build_query в PHP)"""
+    pairs = []
+    for key, value in params.items():
+        name = f'{prefix}[{key}]' if prefix else str(key)
+        if isinstance(value, dict):
+            pairs.extend(_flatten_params(value, name))
+        elif isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                if isinstance(item, dict):
+                    pairs.extend(_flatten_params(item, f'{name}[{index}]'))
+                else:
+                    pairs.append((f'{name}[{index}]', item))
+        else:
+            pairs.append((name, value))
+    return pairs
+
+
+class BitrixAPIError(Exception):
+    """Ошибка при получении данных из Битрикс24"""
+
+
+class BitrixUnavailableError(BitrixAPIError):
+    """Портал недоступен (сеть, перегрузка, разомкнут предохранитель): запрос стоит повторить позже"""
+
+
+# Коды ответа и ошибки Bitrix, после которых запрос имеет смысл повторить
+RETRY_STATUS_CODES = {429, 503}
+RETRY_ERROR_CODES = {'QUERY_LIMIT_EXCEEDED'}
+# Ошибки, говорящие о недоступности портала (а не о неверном запросе): считаются предохранителем
+TRANSPORT_ERROR_CODES = {'connection_error', 'invalid_response', 'circuit_open',
+                         'QUERY_LIMIT_EXCEEDED', 'INTERNAL_SERVER_ERROR'}
+
+
+def api_error(method: str, result: Dict) -> BitrixAPIError:
+    """Исключение по ответу с ошибкой: недоступность портала отделена от ошибок самого запроса"""
+    error_class = BitrixUnavailableError if result.get('error') in TRANSPORT_ERROR_CODES else BitrixAPIError
+    return error_class(f"{method}: {result.get('error')} - {result.get('error_description', '')}")
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: не больше rate запросов в секунду с запасом capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Забрать один токен, при необходимости подождать его появления"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_http_lock = threading.Lock()
+_http_session = None
+_http_session_pid = None
+_rate_limiter = None
+_circuit_breaker = None
+
+
+def get_http_session() -> requests.Session:
+    """Keep-alive сессия, одна на процесс (после fork создается заново)"""
+    global _http_session, _http_session_pid
+    with _http_lock:
+        if _http_session is None or _http_session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=getattr(settings, 'BITRIX24_POOL_SIZE', 10))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+            _http_session_pid = os.getpid()
+        return _http_session
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Общий для всех методов API ограничитель частоты запросов"""
+    global _rate_limiter
+    with _http_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(
+                rate=getattr(settings, 'BITRIX24_RATE_LIMIT', 2),
+                capacity=getattr(settings, 'BITRIX24_RATE_BURST', 2),
+            )
+        return _rate_limiter
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Общий на процесс предохранитель: при недоступном портале запросы сразу отклоняются"""
+    global _circuit_breaker
+    with _http_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                failure_threshold=getattr(settings, 'BITRIX24_BREAKER_THRESHOLD', 5),
+                reset_timeout=getattr(settings, 'BITRIX24_BREAKER_RESET', 30),
+            )
+        return _circuit_breaker
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Экспоненциальная задержка с полным джиттером (или Retry-After от сервера)"""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    base = getattr(settings, 'BITRIX24_BACKOFF_BASE', 0.5)
+    cap = getattr(settings, 'BITRIX24_BACKOFF_MAX', 30)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def build_batch_command(method: str, params: Dict = None) -> str:
+    """Собрать строку команды для batch: 'user.get?start=50&filter[ID]=1'"""
+    if not params:
+        return method
+    return f'{method}?{urlencode(_flatten_params(params))}'
+
+
+def calendar_event_params(user_id: int, event_data: Dict) -> Dict:
+    """Параметры calendar.event.add для события в личном календаре сотрудника"""
+    return {
+        'type': 'user',
+        'ownerId': user_id,
+        'name': event_data.get('name'),
+        'description': event_data.get('description', ''),
+        'from': event_data.get('from'),
+        'to': event_data.get('to'),
+        'section': event_data.get('section', 'Отпуска'),
+    }
+
+
+def notification_params(user_id: int, message: str) -> Dict:
+    """Параметры im.notify для системного уведомления"""
+    return {
+        'to': user_id,
+        'message': message,
+        'type': 'SYSTEM',
+    }
+
+
 # ============================================
 # ЗАГЛУШКА (МОК) для разработки без Битрикса
 # ============================================
@@ -15,9 +180,9 @@ class MockBitrix24API:
     """🔧 Заглушка Bitrix API для разработки (не требует реального портала)"""
     
     def __init__(self, webhook_url=None):
-        print("🔧 РЕЖИМ РАЗРАБОТКИ: Используется ЗАГЛУШКА Bitrix API")
-        print("   Реальные запросы к Битриксу НЕ отправляются")
+        logger.info("РЕЖИМ РАЗРАБОТКИ: используется заглушка Bitrix API, реальные запросы не отправляются")
         self.users_db = self._create_test_users()
+        self.users_by_id = {str(user['ID']): user for user in self.users_db}
     
     def _create_test_users(self):
         """Создаем тестовых пользователей"""
@@ -83,50 +248,59 @@ class MockBitrix24API:
         ]
     
     def get_users(self, filter_params=None) -> List[Dict]:
-        """Вернуть тестовых пользователей"""
-        users = self.users_db.copy()
-        
-        # Применяем фильтры (если есть)
-        if filter_params:
-            filtered = []
-            for user in users:
-                match = True
-                for key, value in filter_params.items():
-                    if key == 'ID' and str(user['ID']) != str(value):
-                        match = False
-                        break
-                    elif key == '>DATE_CREATE':
-                        # Простая имитация фильтра по дате
-                        pass
-                if match:
-                    filtered.append(user)
-            users = filtered
-        
-        return users
+        """Вернуть тестовых пользователей (фильтры — как у user.get)"""
+        return filter_users(self.users_db, filter_params)
+
+    def get_max_user_id(self, filter_params=None) -> Optional[int]:
+        """Наибольший ID среди тестовых пользователей"""
+        users = self.get_users(filter_params)
+        return max((int(user['ID']) for user in users), default=None)
+
+    def iter_user_pages(self, filter_params=None) -> Iterator[List[Dict]]:
+        """Отдавать тестовых пользователей страницами, как реальный API"""
+        users = self.get_users(filter_params)
+        for offset in range(0, len(users), PAGE_SIZE):
+            yield users[offset:offset + PAGE_SIZE]
     
-    def get_user(self, user_id: int) -> Optional[Dict]:
+    def get_user(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
         """Получить одного пользователя"""
-        for user in self.users_db:
-            if str(user['ID']) == str(user_id):
-                return user
-        return None
+        return self.users_by_id.get(str(user_id))
     
     def create_calendar_event(self, user_id: int, event_data: Dict) -> Optional[Dict]:
         """Создать событие в календаре (заглушка)"""
         event_id = random.randint(10000, 99999)
-        print(f"📅 [MOCK] Создано событие в календаре для пользователя {user_id}")
-        print(f"   Событие: {event_data.get('name')}")
-        print(f"   Даты: {event_data.get('from')} - {event_data.get('to')}")
-        print(f"   ID события: {event_id}")
+        logger.info(
+            f"[MOCK] Создано событие {event_id} в календаре пользователя {user_id}: "
+            f"{event_data.get('name')} ({event_data.get('from')} - {event_data.get('to')})"
+        )
         return {'id': event_id}
     
     def send_notification(self, user_id: int, message: str) -> bool:
         """Отправить уведомление (заглушка)"""
         user = self.get_user(user_id)
         user_name = user['NAME'] if user else f"ID {user_id}"
-        print(f"🔔 [MOCK] Уведомление для {user_name}: {message}")
+        logger.info(f"[MOCK] Уведомление для {user_name}: {message}")
         return True
 
+    def call_batch(self, commands: Dict[str, str]) -> Dict:
+        """Выполнить пачку команд (заглушка понимает calendar.event.add и im.notify)"""
+        result, errors = {}, {}
+        for key, command in commands.items():
+            method, _, query = command.partition('?')
+            params = unflatten_params(parse_qsl(query, keep_blank_values=True))
+            if method == 'calendar.event.add':
+                event = self.create_calendar_event(params.get('ownerId'), params)
+                result[key] = event['id']
+            elif method == 'im.notify':
+                result[key] = self.send_notification(params.get('to'), params.get('message', ''))
+            else:
+                errors[key] = {'error': 'ERROR_METHOD_NOT_FOUND', 'error_description': method}
+        return {'result': result, 'result_error': errors, 'result_total': {}, 'result_next': {}}
+
+
+_MISSING_USERS = object()
+_MISSING_USER = object()
+
 
 # ============================================
 # РЕАЛЬНЫЙ КЛАСС для работы с API Битрикс24
@@ -139,66 +313,206 @@ class RealBitrix24API:
         self.webhook_url = webhook_url or settings.BITRIX24_WEBHOOK
         if not self.webhook_url:
             raise ValueError("BITRIX24_WEBHOOK не настроен в .env файле")
-        print("🌐 РЕЖИМ РАБОТЫ с реальным Битрикс24")
-    
+        self.cache = TTLCache(
+            maxsize=getattr(settings, 'BITRIX24_CACHE_SIZE', 10000),
+            ttl=getattr(settings, 'BITRIX24_CACHE_TTL', 300),
+            stale_ttl=getattr(settings, 'BITRIX24_CACHE_STALE_TTL', 3600),
+        )
+        logger.info("РЕЖИМ РАБОТЫ с реальным Битрикс24")
+
     def _request(self, method: str, params: Dict = None) -> Dict:
-        """Базовый метод для запросов к API"""
+        """Базовый метод для запросов к API (через предохранитель)"""
+        breaker = get_circuit_breaker()
+        if not breaker.allow():
+            return {'error': 'circuit_open', 'error_description': 'Битрикс24 недоступен, повторите позже'}
+
+        result = self._send(method, params)
+        if result.get('error') in TRANSPORT_ERROR_CODES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return result
+
+    def _send(self, method: str, params: Dict = None) -> Dict:
+        """Отправить запрос с ограничением частоты и повторами"""
         url = f"{self.webhook_url}{method}"
-        
-        try:
-            response = requests.post(url, json=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'error' in data:
-                logger.error(f"Bitrix API error: {data['error']} - {data.get('error_description', '')}")
-                return {'error': data['error'], 'error_description': data.get('error_description', '')}
-            
-            return data
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error: {e}")
-            return {'error': 'connection_error', 'error_description': str(e)}
+        session = get_http_session()
+        limiter = get_rate_limiter()
+        timeout = (
+            getattr(settings, 'BITRIX24_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'BITRIX24_READ_TIMEOUT', 30),
+        )
+        max_retries = getattr(settings, 'BITRIX24_MAX_RETRIES', 5)
+
+        attempt = 0
+        while True:
+            limiter.acquire()
+            try:
+                response = session.post(url, json=params, timeout=timeout)
+
+                if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                    delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+                    logger.warning(f"Bitrix {method}: HTTP {response.status_code}, повтор через {delay:.1f} с")
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict):
+                    response.raise_for_status()
+                    logger.error(f"Bitrix {method}: некорректный ответ")
+                    return {'error': 'invalid_response', 'error_description': response.text[:200]}
+
+                if data.get('error') in RETRY_ERROR_CODES and attempt < max_retries:
+                    delay = backoff_delay(attempt)
+                    logger.warning(f"Bitrix {method}: {data['error']}, повтор через {delay:.1f} с")
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+
+                if 'error' in data:
+                    logger.error(f"Bitrix API error: {data['error']} - {data.get('error_description', '')}")
+                    return {'error': data['error'], 'error_description': data.get('error_description', '')}
+
+                response.raise_for_status()
+                return data
+
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Request error: {e}")
+                return {'error': 'connection_error', 'error_description': str(e)}
     
-    def get_users(self, filter_params: Dict = None) -> List[Dict]:
-        """Получить список пользователей"""
-        params = {}
+    def call_batch(self, commands: Dict[str, str]) -> Dict:
+        """
+        Выполнить до BATCH_LIMIT команд за один запрос.
+
+        Возвращает словарь с ключами 'result', 'result_error', 'result_total',
+        'result_next' (как в ответе Bitrix) или {'error': ...} при сбое запроса.
+        """
+        result = self._request('batch', {'halt': 0, 'cmd': commands})
+        if 'error' in result:
+            return result
+        return result.get('result', {})
+
+    def iter_user_pages(self, filter_params: Dict = None) -> Iterator[List[Dict]]:
+        """
+        Отдавать пользователей постранично, по мере получения.
+
+        Первая страница запрашивается обычным вызовом, чтобы узнать total,
+        остальные страницы упаковываются в batch по BATCH_LIMIT штук.
+        Страницы идут по возрастанию ID. Если какую-то страницу получить
+        не удалось, бросает BitrixAPIError.
+        """
+        params = {'sort': 'ID', 'order': 'ASC'}
+        if filter_params:
+            params['filter'] = filter_params
+
+        first = self._request('user.get', {**params, 'start': 0})
+        if 'result' not in first:
+            raise api_error('user.get', first)
+
+        if first['result']:
+            yield list(first['result'])
+        total = int(first.get('total', len(first['result'])))
+        if 'next' not in first or total <= len(first['result']):
+            return
+
+        starts = list(range(PAGE_SIZE, total, PAGE_SIZE))
+        for offset in range(0, len(starts), BATCH_LIMIT):
+            chunk = starts[offset:offset + BATCH_LIMIT]
+            commands = {
+                f'p{start}': build_batch_command('user.get', {**params, 'start': start})
+                for start in chunk
+            }
+            batch = self.call_batch(commands)
+            if 'error' in batch:
+                raise api_error('batch', batch)
+
+            # Неполный список хуже ошибки: синхронизация решит, что пользователей нет
+            errors = batch.get('result_error') or {}
+            if errors:
+                raise BitrixAPIError(f"batch user.get: {errors}")
+
+            pages = batch.get('result') or {}
+            for start in chunk:
+                page = pages.get(f'p{start}')
+                if page:
+                    yield list(page)
+
+    def get_max_user_id(self, filter_params: Dict = None) -> Optional[int]:
+        """Наибольший ID пользователя — верхняя граница для разбиения на шарды"""
+        params = {'sort': 'ID', 'order': 'DESC', 'start': 0}
         if filter_params:
             params['filter'] = filter_params
-            
         result = self._request('user.get', params)
-        return result.get('result', []) if 'result' in result else []
-    
-    def get_user(self, user_id: int) -> Optional[Dict]:
-        """Получить одного пользователя"""
-        result = self._request('user.get', {'filter': {'ID': user_id}})
-        users = result.get('result', [])
-        return users[0] if users else None
+        if 'result' not in result:
+            raise api_error('user.get', result)
+        return int(result['result'][0]['ID']) if result['result'] else None
+
+    def get_users(self, filter_params: Dict = None) -> List[Dict]:
+        """
+        Получить полный список пользователей (все страницы сразу).
+
+        Ответ кэшируется по фильтру; при недоступном портале отдается
+        устаревшая копия, если она есть. Для синхронизации используйте
+        iter_user_pages — он всегда идет в Битрикс.
+        """
+        def load():
+            try:
+                users = []
+                for page in self.iter_user_pages(filter_params):
+                    users.extend(page)
+                return True, users
+            except BitrixAPIError:
+                return False, _MISSING_USERS
+
+        key = ('users', json.dumps(filter_params or {}, sort_keys=True, default=str))
+        users = self.cache.get_or_load(key, load)
+        if users is _MISSING_USERS:
+            raise BitrixAPIError('Не удалось получить список пользователей')
+        return users
+
+    def get_user(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
+        """
+        Получить одного пользователя (через кэш stale-while-revalidate).
+
+        use_cache=False — всегда идти в Битрикс (например, по событию
+        об изменении); свежий ответ все равно кладется в кэш.
+        None означает, что Битрикс ответил и такого пользователя нет. Если
+        ответа нет (и нет копии в кэше), бросает BitrixAPIError — сбой
+        нельзя принимать за удаление пользователя.
+        """
+        failure = {}
+
+        def load():
+            result = self._request('user.get', {'filter': {'ID': user_id}})
+            if 'result' not in result:
+                failure.update(result)
+                return False, _MISSING_USER
+            users = result['result']
+            return True, (users[0] if users else None)
+
+        key = ('user', str(user_id))
+        if use_cache:
+            user = self.cache.get_or_load(key, load)
+        else:
+            ok, user = load()
+            if ok:
+                self.cache.set(key, user)
+        if user is _MISSING_USER:
+            raise api_error('user.get', failure)
+        return user
     
     def create_calendar_event(self, user_id: int, event_data: Dict) -> Optional[Dict]:
         """Создать событие в календаре"""
-        params = {
-            'type': 'user',
-            'ownerId': user_id,
-            'name': event_data.get('name'),
-            'description': event_data.get('description', ''),
-            'from': event_data.get('from'),
-            'to': event_data.get('to'),
-            'section': event_data.get('section', 'Отпуска'),
-        }
-        
-        result = self._request('calendar.event.add', params)
+        result = self._request('calendar.event.add', calendar_event_params(user_id, event_data))
         return result.get('result') if 'result' in result else None
     
     def send_notification(self, user_id: int, message: str) -> bool:
         """Отправить уведомление пользователю"""
-        params = {
-            'to': user_id,
-            'message': message,
-            'type': 'SYSTEM',
-        }
-        
-        result = self._request('im.notify', params)
+        result = self._request('im.notify', notification_params(user_id, message))
         return result.get('result', False)
 
 
@@ -211,9 +525,17 @@ class RealBitrix24API:
 #   False = реальный API (требует вебхук в .env)
 USE_MOCK_FOR_DEVELOPMENT = True  
 
+_clients_lock = threading.Lock()
+_clients: Dict[tuple, Any] = {}
+
+
 def get_bitrix_api(webhook_url=None, force_mock=None):
     """
-    Фабрика для создания API.
+    Фабрика для получения API.
+
+    Клиенты создаются лениво, один раз на процесс для каждой пары
+    (режим, вебхук), и переиспользуются всеми запросами и потоками.
+    HTTP-сессия и ограничитель частоты у всех клиентов общие.
     
     Параметры:
         webhook_url: опциональный URL вебхука
@@ -222,17 +544,62 @@ def get_bitrix_api(webhook_url=None, force_mock=None):
     Возвращает:
         Объект API (реальный или заглушку)
     """
-    if force_mock is True:
-        return MockBitrix24API(webhook_url)
-    
-    if force_mock is False:
-        return RealBitrix24API(webhook_url)
-    
-    # Автоматический выбор на основе глобальной настройки
-    if USE_MOCK_FOR_DEVELOPMENT:
-        return MockBitrix24API(webhook_url)
+    if force_mock is None:
+        # Автоматический выбор на основе глобальной настройки
+        use_mock = USE_MOCK_FOR_DEVELOPMENT
     else:
-        return RealBitrix24API(webhook_url)
+        use_mock = bool(force_mock)
+
+    if use_mock:
+        key = ('mock', webhook_url)
+    else:
+        key = ('real', webhook_url or settings.BITRIX24_WEBHOOK)
+
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = MockBitrix24API(webhook_url) if use_mock else RealBitrix24API(webhook_url)
+                _clients[key] = client
+    return client
+
+
+def reset_bitrix_api():
+    """Сбросить клиентов, HTTP-сессию и ограничитель (для тестов и смены настроек)"""
+    global _http_session, _http_session_pid, _rate_limiter, _circuit_breaker
+    with _clients_lock:
+        _clients.clear()
+    with _http_lock:
+        if _http_session is not None:
+            _http_session.close()
+        _http_session = None
+        _http_session_pid = None
+        _rate_limiter = None
+        _circuit_breaker = None
+
+
+def get_bitrix_health() -> Dict:
+    """Состояние предохранителя и кэшей клиентов — для мониторинга"""
+    with _clients_lock:
+        clients = list(_clients.items())
+    return {
+        'circuit_breaker': get_circuit_breaker().stats(),
+        'caches': {
+            f'{mode}:{webhook or "default"}': client.cache.stats()
+            for (mode, webhook), client in clients
+            if hasattr(client, 'cache')
+        },
+    }
+
+
+def _reset_on_setting_changed(setting, **kwargs):
+    """override_settings(BITRIX24_...) в тестах не должен видеть старых клиентов"""
+    if setting.startswith('BITRIX24_'):
+        reset_bitrix_api()
+
+
+setting_changed.connect(_reset_on_setting_changed)
 
 
 # Для обратной совместимости (если старый код использует Bitrix24API)
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# ============================================
+# Параметры REST Битрикс24: фильтры user.get и разбор http_build_query
+# ============================================
+# Общие для клиента API (заглушка, приемник событий) и стенда нагрузочного
+# тестирования: фильтр разбирается и применяется так же, как на портале.
+
+# Время портала без явной зоны — московское
+MSK = dt_timezone(timedelta(hours=3))
+
+# Операторы фильтра Битрикса в порядке проверки (двухсимвольные раньше односимвольных)
+FILTER_OPERATORS = ['>=', '<=', '>', '<', '!', '=']
+DATE_FIELDS = {'DATE_CREATE', 'DATE_MODIFY', 'PERSONAL_BIRTHDAY'}
+INT_FIELDS = {'ID', 'UF_DEPARTMENT'}
+
+
+def parse_filter_value(field: str, value):
+    """Привести значение фильтра к тому же виду, в котором хранится поле"""
+    if field in INT_FIELDS:
+        return int(value)
+    if field == 'ACTIVE':
+        return str(value).upper() in ('Y', 'TRUE', '1')
+    if field in DATE_FIELDS:
+        return to_timestamp(value)
+    return str(value)
+
+
+def to_timestamp(value) -> Optional[float]:
+    """'2024-02-01' или '2024-02-01T10:00:00+03:00' -> секунды epoch (без зоны — по Москве)"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=MSK)
+    return parsed.timestamp()
+
+
+def compile_filter(filter_params: Optional[Dict]) -> List[Tuple[str, str, Any]]:
+    """Разобрать фильтр {'>=ID': 5, 'ACTIVE': 'Y'} в список условий (поле, оператор, значение)"""
+    conditions = []
+    for key, value in (filter_params or {}).items():
+        op = '='
+        for candidate in FILTER_OPERATORS:
+            if key.startswith(candidate):
+                op, key = candidate, key[len(candidate):]
+                break
+        field = key.upper()
+        if isinstance(value, dict):
+            # Массив из строки запроса: filter[ID][0]=1&filter[ID][1]=2
+            value = list(value.values())
+        if isinstance(value, (list, tuple)):
+            parsed = {parse_filter_value(field, item) for item in value}
+        else:
+            parsed = parse_filter_value(field, value)
+        conditions.append((field, op, parsed))
+    return conditions
+
+
+def _compare(actual, op: str, expected) -> bool:
+    if isinstance(actual, (list, tuple)):
+        # Множественные поля (UF_DEPARTMENT): условие выполняется, если подходит хоть одно значение
+        matched = any(_compare(item, '=', expected) for item in actual)
+        return not matched if op == '!' else matched
+    if isinstance(expected, set):
+        matched = actual in expected
+        return not matched if op == '!' else matched
+    if op in ('=', '!'):
+        return (actual == expected) if op == '=' else (actual != expected)
+    if actual is None or expected is None:
+        return False
+    if op == '>':
+        return actual > expected
+    if op == '<':
+        return actual < expected
+    if op == '>=':
+        return actual >= expected
+    return actual <= expected
+
+
+def matches(get_field: Callable[[str], Any], conditions: List[Tuple[str, str, Any]]) -> bool:
+    """Проверить запись на соответствие условиям; get_field отдает значение поля в нормализованном виде"""
+    return all(_compare(get_field(field), op, value) for field, op, value in conditions)
+
+
+def filter_users(users: Iterable[Dict], filter_params: Optional[Dict]) -> List[Dict]:
+    """Отфильтровать пользователей-словари как это делает user.get"""
+    conditions = compile_filter(filter_params)
+    if not conditions:
+        return list(users)
+
+    def getter_for(user):
+        def get_field(field):
+            value = user.get(field)
+            if field in INT_FIELDS:
+                if isinstance(value, (list, tuple)):
+                    return [int(item) for item in value]
+                return int(value) if value not in (None, '') else None
+            if field == 'ACTIVE':
+                return value is not False and value != 'N'
+            if field in DATE_FIELDS:
+                return to_timestamp(value)
+            return value
+        return get_field
+
+    return [user for user in users if matches(getter_for(user), conditions)]
+
+
+def unflatten_params(pairs: Iterable[Tuple[str, str]]) -> Dict:
+    """Обратное к http_build_query: 'filter[>ID]=5' -> {'filter': {'>ID': '5'}}"""
+    result: Dict = {}
+    for key, value in pairs:
+        parts = key.replace(']', '').split('[')
+        node = result
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise ValueError(f'Параметр {key} конфликтует с уже заданным значением')
+        node[parts[-1]] = value
+    return result
@@ -0,0 +1,378 @@
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+from core.services.bitrix_params import MSK, compile_filter, matches, to_timestamp, unflatten_params
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# Локальная замена REST API Битрикс24 для нагрузочного тестирования
+# ============================================
+
+PAGE_SIZE = 50
+BATCH_LIMIT = 50
+
+FIRST_NAMES = ['Иван', 'Мария', 'Алексей', 'Елена', 'Дмитрий', 'Ольга', 'Сергей', 'Анна',
+               'Павел', 'Наталья', 'Андрей', 'Татьяна', 'Михаил', 'Ирина', 'Николай', 'Юлия']
+LAST_NAMES = ['Петров', 'Сидоров', 'Иванов', 'Козлов', 'Соколов', 'Смирнов', 'Попов', 'Волков',
+              'Новиков', 'Морозов', 'Лебедев', 'Кузнецов', 'Орлов', 'Егоров', 'Павлов', 'Фролов']
+POSITIONS = ['Team Lead', 'HR-менеджер', 'Junior Developer', 'Middle Developer', 'Senior Developer',
+             'QA Engineer', 'Frontend Developer', 'Backend Developer', 'Аналитик', 'Дизайнер',
+             'Менеджер проектов', 'DevOps Engineer', 'Бухгалтер', 'Офис-менеджер']
+
+
+class BitrixStandIn:
+    """
+    Синтетический портал Битрикс24 в памяти.
+
+    Генерирует справочник на users сотрудников (колонками, без словаря на
+    каждого пользователя), ищет по ID бинарным поиском и через индексы,
+    реализует постраничный user.get, batch, фильтры, задержку ответа
+    и ошибки QUERY_LIMIT_EXCEEDED при превышении лимита частоты.
+    """
+
+    def __init__(self, users: int = 1000, departments: int = 50, seed: int = 42,
+                 latency: float = 0.0, rate_limit: Optional[float] = None, burst: int = 50,
+                 error_rate: float = 0.0, inactive_share: float = 0.03):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._tokens_updated = time.monotonic()
+        self._next_event_id = 10000
+        self.stats = {'requests': 0, 'rejected': 0, 'batch_commands': 0}
+        self._generate(users, departments, inactive_share)
+
+    # ---------- генерация справочника ----------
+
+    def _generate(self, count: int, departments: int, inactive_share: float):
+        rnd = self._random
+        today = date.today()
+        now = datetime.now(MSK).timestamp()
+
+        self.departments = [
+            {'ID': str(dep_id), 'NAME': f'Отдел {dep_id}', 'PARENT': '1' if dep_id > 1 else None}
+            for dep_id in range(1, departments + 1)
+        ]
+
+        self.ids: List[int] = []
+        self.first_names: List[int] = []
+        self.last_names: List[int] = []
+        self.positions: List[int] = []
+        self.department_ids: List[int] = []
+        self.active: List[bool] = []
+        self.birthdays: List[int] = []
+        self.created: List[float] = []
+        self.modified: List[float] = []
+
+        user_id = 0
+        for _ in range(count):
+            # Дыры в нумерации, как на живом портале после удалений
+            user_id += 1 if rnd.random() > 0.05 else rnd.randint(2, 5)
+            hired = today - timedelta(days=rnd.randint(0, 365 * 12))
+            created = datetime(hired.year, hired.month, hired.day, 9, tzinfo=MSK).timestamp()
+            self.ids.append(user_id)
+            self.first_names.append(rnd.randrange(len(FIRST_NAMES)))
+            self.last_names.append(rnd.randrange(len(LAST_NAMES)))
+            self.positions.append(rnd.randrange(len(POSITIONS)))
+            self.department_ids.append(rnd.randint(1, max(1, departments)))
+            self.active.append(rnd.random() >= inactive_share)
+            self.birthdays.append((today - timedelta(days=rnd.randint(365 * 20, 365 * 60))).toordinal())
+            self.created.append(created)
+            self.modified.append(rnd.uniform(created, now))
+
+        # Индексы для быстрых выборок
+        self.position_by_id = {user_id: index for index, user_id in enumerate(self.ids)}
+        self.by_department: Dict[int, List[int]] = {}
+        for index, dep_id in enumerate(self.department_ids):
+            self.by_department.setdefault(dep_id, []).append(index)
+
+    def touch(self, count: int) -> List[int]:
+        """Пометить count случайных пользователей измененными сейчас (для инкрементальной синхронизации)"""
+        now = datetime.now(MSK).timestamp()
+        with self._lock:
+            indexes = self._random.sample(range(len(self.ids)), min(count, len(self.ids)))
+            for index in indexes:
+                self.modified[index] = now
+        return [self.ids[index] for index in indexes]
+
+    def user_payload(self, index: int) -> Dict:
+        """Собрать пользователя в формате ответа user.get"""
+        user_id = self.ids[index]
+        first = FIRST_NAMES[self.first_names[index]]
+        last = LAST_NAMES[self.last_names[index]]
+        return {
+            'ID': str(user_id),
+            'NAME': first,
+            'LAST_NAME': last,
+            'EMAIL': f'user{user_id}@standin.local',
+            'WORK_POSITION': POSITIONS[self.positions[index]],
+            'ACTIVE': self.active[index],
+            'PERSONAL_BIRTHDAY': date.fromordinal(self.birthdays[index]).isoformat(),
+            'UF_DEPARTMENT': [self.department_ids[index]],
+            'WORK_PHONE': f'+7 (900) {user_id // 10000 % 1000:03d}-{user_id // 100 % 100:02d}-{user_id % 100:02d}',
+            'DATE_CREATE': datetime.fromtimestamp(self.created[index], MSK).isoformat(timespec='seconds'),
+            'DATE_MODIFY': datetime.fromtimestamp(self.modified[index], MSK).isoformat(timespec='seconds'),
+        }
+
+    def _field(self, index: int, field: str):
+        if field == 'ID':
+            return self.ids[index]
+        if field == 'UF_DEPARTMENT':
+            return [self.department_ids[index]]
+        if field == 'ACTIVE':
+            return self.active[index]
+        if field == 'DATE_CREATE':
+            return self.created[index]
+        if field == 'DATE_MODIFY':
+            return self.modified[index]
+        if field == 'PERSONAL_BIRTHDAY':
+            return to_timestamp(date.fromordinal(self.birthdays[index]).isoformat())
+        if field == 'NAME':
+            return FIRST_NAMES[self.first_names[index]]
+        if field == 'LAST_NAME':
+            return LAST_NAMES[self.last_names[index]]
+        if field == 'WORK_POSITION':
+            return POSITIONS[self.positions[index]]
+        if field == 'EMAIL':
+            return f'user{self.ids[index]}@standin.local'
+        return None
+
+    def select(self, filter_params: Optional[Dict]) -> List[int]:
+        """Индексы пользователей под фильтр, по возрастанию ID"""
+        conditions = compile_filter(filter_params)
+
+        # Сужаем кандидатов по индексам: точный ID, диапазон ID, отдел
+        lo, hi = 0, len(self.ids)
+        candidates: Optional[List[int]] = None
+        rest = []
+        for field, op, value in conditions:
+            if field == 'ID' and op == '=' and not isinstance(value, set):
+                index = self.position_by_id.get(value)
+                candidates = [index] if index is not None else []
+            elif field == 'ID' and op in ('>', '>='):
+                lo = max(lo, (bisect_right if op == '>' else bisect_left)(self.ids, value))
+            elif field == 'ID' and op in ('<', '<='):
+                hi = min(hi, (bisect_left if op == '<' else bisect_right)(self.ids, value))
+            elif field == 'UF_DEPARTMENT' and op == '=' and not isinstance(value, set):
+                candidates = self.by_department.get(value, [])
+            else:
+                rest.append((field, op, value))
+
+        if candidates is None:
+            candidates = range(lo, hi)
+        else:
+            candidates = [index for index in candidates if lo <= index < hi]
+
+        if not rest:
+            return list(candidates)
+        return [index for index in candidates if matches(lambda field: self._field(index, field), rest)]
+
+    # ---------- методы REST ----------
+
+    def _throttle(self) -> bool:
+        """Leaky bucket как у Битрикса: burst запросов сразу, дальше rate_limit в секунду"""
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._tokens_updated) * self.rate_limit)
+            self._tokens_updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def handle(self, method: str, params: Optional[Dict]) -> Tuple[int, Dict]:
+        """Обработать один HTTP-запрос к REST: вернуть (HTTP-статус, тело ответа)"""
+        self.stats['requests'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if not self._throttle():
+            self.stats['rejected'] += 1
+            return 503, {'error': 'QUERY_LIMIT_EXCEEDED', 'error_description': 'Too many requests'}
+        if self.error_rate and self._random.random() < self.error_rate:
+            return 503, {'error': 'INTERNAL_SERVER_ERROR', 'error_description': 'Синтетический сбой'}
+
+        started = time.monotonic()
+        if method == 'batch':
+            body = self._batch(params or {})
+        else:
+            body = self.call(method, params or {})
+        body.setdefault('time', {'start': started, 'duration': time.monotonic() - started})
+        return (400 if 'error' in body else 200), body
+
+    def call(self, method: str, params: Dict) -> Dict:
+        """Выполнить метод REST без учета лимитов и задержки (используется и внутри batch)"""
+        handler = {
+            'user.get': self._user_get,
+            'department.get': self._department_get,
+            'calendar.event.add': self._calendar_event_add,
+            'im.notify': self._im_notify,
+        }.get(method)
+        if handler is None:
+            return {'error': 'ERROR_METHOD_NOT_FOUND', 'error_description': f'Method not found: {method}'}
+        try:
+            return handler(params)
+        except (KeyError, TypeError, ValueError) as e:
+            return {'error': 'INVALID_ARG_VALUE', 'error_description': str(e)}
+
+    def _page(self, items: List, params: Dict, render: Callable) -> Dict:
+        start = int(params.get('start') or 0)
+        chunk = items[start:start + PAGE_SIZE]
+        response = {'result': [render(item) for item in chunk], 'total': len(items)}
+        if start + PAGE_SIZE < len(items):
+            response['next'] = start + PAGE_SIZE
+        return response
+
+    def _user_get(self, params: Dict) -> Dict:
+        filter_params = params.get('filter') or params.get('FILTER')
+        # user.get принимает фильтр и прямо в корне параметров
+        if filter_params is None:
+            filter_params = {key: value for key, value in params.items()
+                             if key not in ('sort', 'order', 'start', 'SORT', 'ORDER', 'ADMIN_MODE')}
+        indexes = self.select(filter_params)
+        if str(params.get('order') or params.get('ORDER') or 'ASC').upper() == 'DESC':
+            indexes.reverse()
+        return self._page(indexes, params, self.user_payload)
+
+    def _department_get(self, params: Dict) -> Dict:
+        return self._page(self.departments, params, dict)
+
+    def _calendar_event_add(self, params: Dict) -> Dict:
+        with self._lock:
+            self._next_event_id += 1
+            return {'result': self._next_event_id}
+
+    def _im_notify(self, params: Dict) -> Dict:
+        return {'result': True}
+
+    def _batch(self, params: Dict) -> Dict:
+        commands = params.get('cmd') or {}
+        if len(commands) > BATCH_LIMIT:
+            return {'error': 'INVALID_REQUEST', 'error_description': f'Max {BATCH_LIMIT} commands'}
+        halt = str(params.get('halt', 0)) in ('1', 'true', 'True')
+
+        result, errors, totals, nexts = {}, {}, {}, {}
+        for key, command in commands.items():
+            self.stats['batch_commands'] += 1
+            method, _, query = command.partition('?')
+            body = self.call(method, unflatten_params(parse_qsl(query, keep_blank_values=True)))
+            if 'error' in body:
+                errors[key] = {'error': body['error'], 'error_description': body.get('error_description', '')}
+                if halt:
+                    break
+                continue
+            result[key] = body['result']
+            if 'total' in body:
+                totals[key] = body['total']
+            if 'next' in body:
+                nexts[key] = body['next']
+        return {'result': {
+            'result': result, 'result_error': errors, 'result_total': totals, 'result_next': nexts,
+        }}
+
+
+def _method_from_path(path: str) -> str:
+    """'/rest/1/token/user.get.json' -> 'user.get'"""
+    method = path.rstrip('/').rsplit('/', 1)[-1]
+    return method[:-5] if method.endswith('.json') else method
+
+
+def _params_from_body(body: bytes, content_type: str, query: str) -> Dict:
+    params = unflatten_params(parse_qsl(query, keep_blank_values=True)) if query else {}
+    if body:
+        if 'json' in (content_type or ''):
+            params.update(json.loads(body.decode('utf-8')) or {})
+        else:
+            params.update(unflatten_params(parse_qsl(body.decode('utf-8'), keep_blank_values=True)))
+    return params
+
+
+class StandInAdapter(BaseAdapter):
+    """Транспорт requests, отвечающий из BitrixStandIn без сети (для тестов и бенчмарков в процессе)"""
+
+    def __init__(self, standin: BitrixStandIn):
+        super().__init__()
+        self.standin = standin
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        params = _params_from_body(body, request.headers.get('Content-Type', ''), url.query)
+        status, payload = self.standin.handle(_method_from_path(url.path), params)
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def mount_standin(session: requests.Session, standin: BitrixStandIn,
+                  prefix: str = 'http://bitrix-standin/') -> str:
+    """
+    Направить запросы сессии с префиксом prefix в стенд и вернуть URL вебхука.
+
+    Пример:
+        standin = BitrixStandIn(users=100_000)
+        webhook = mount_standin(get_http_session(), standin)
+        RealBitrix24API(webhook).get_users()
+    """
+    session.mount(prefix, StandInAdapter(standin))
+    return f'{prefix}rest/1/standin/'
+
+
+def make_server(standin: BitrixStandIn, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    """HTTP-сервер, отвечающий как REST Битрикс24: http://host:port/rest/1/<token>/<method>"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _respond(self):
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            try:
+                params = _params_from_body(body, self.headers.get('Content-Type', ''), url.query)
+            except ValueError as e:
+                status, payload = 400, {'error': 'INVALID_REQUEST', 'error_description': str(e)}
+            else:
+                status, payload = standin.handle(_method_from_path(url.path), params)
+
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = _respond
+        do_POST = _respond
+
+        def log_message(self, format, *args):
+            logger.debug("standin: " + format, *args)
+
+    return ThreadingHTTPServer((host, port), Handler)
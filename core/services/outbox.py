@@ -0,0 +1,158 @@
+import logging
+import random
+from datetime import timedelta
+from typing import Dict, List
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import BitrixOutbox
+from core.services.bitrix import (
+    BATCH_LIMIT, build_batch_command, calendar_event_params, notification_params,
+)
+
+logger = logging.getLogger(__name__)
+
+# После стольких неудачных попыток запись помечается как failed
+MAX_ATTEMPTS = 8
+# На сколько запись «забирается» воркером, чтобы ее не отправил параллельный воркер
+LEASE = timedelta(minutes=2)
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+
+def enqueue(kind: str, bitrix_user_id: int, payload: Dict, idempotency_key: str) -> BitrixOutbox:
+    """
+    Записать вызов Битрикса в очередь.
+
+    Вызывать внутри той же транзакции, что и бизнес-изменение: если она
+    откатится, вызов тоже не уйдет. Повторная постановка с тем же ключом
+    возвращает существующую запись.
+    """
+    entry, _ = BitrixOutbox.objects.get_or_create(
+        idempotency_key=idempotency_key,
+        defaults={'kind': kind, 'bitrix_user_id': bitrix_user_id, 'payload': payload},
+    )
+    return entry
+
+
+def enqueue_calendar_event(bitrix_user_id: int, event_data: Dict, idempotency_key: str) -> BitrixOutbox:
+    """Поставить в очередь событие в календаре сотрудника"""
+    return enqueue('calendar_event', bitrix_user_id, event_data, idempotency_key)
+
+
+def enqueue_notification(bitrix_user_id: int, message: str, idempotency_key: str) -> BitrixOutbox:
+    """Поставить в очередь уведомление сотруднику"""
+    return enqueue('notification', bitrix_user_id, {'message': message}, idempotency_key)
+
+
+def enqueue_many(entries: List[BitrixOutbox]) -> int:
+    """
+    Записать пачку вызовов одним INSERT (например, при массовом утверждении).
+
+    Записи собираются через outbox_entry; уже поставленные ключи
+    пропускаются базой, как и в enqueue.
+    """
+    BitrixOutbox.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+    return len(entries)
+
+
+def outbox_entry(kind: str, bitrix_user_id: int, payload: Dict, idempotency_key: str) -> BitrixOutbox:
+    """Несохраненная запись очереди для enqueue_many"""
+    return BitrixOutbox(kind=kind, bitrix_user_id=bitrix_user_id, payload=payload, idempotency_key=idempotency_key)
+
+
+def _command(entry: BitrixOutbox) -> str:
+    if entry.kind == 'calendar_event':
+        return build_batch_command('calendar.event.add', calendar_event_params(entry.bitrix_user_id, entry.payload))
+    if entry.kind == 'notification':
+        return build_batch_command('im.notify', notification_params(entry.bitrix_user_id, entry.payload.get('message', '')))
+    raise ValueError(f'Неизвестный тип вызова: {entry.kind}')
+
+
+def _claim(limit: int) -> List[BitrixOutbox]:
+    """Забрать готовые к отправке записи (на PostgreSQL — пропуская занятые другими воркерами)"""
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            BitrixOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by('id')[:limit]
+        )
+        if entries:
+            BitrixOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(
+                next_attempt_at=now + LEASE
+            )
+    return entries
+
+
+def _mark_retry(entry: BitrixOutbox, error: str, now):
+    entry.attempts += 1
+    entry.last_error = error[:2000]
+    if entry.attempts >= MAX_ATTEMPTS:
+        entry.status = 'failed'
+        entry.next_attempt_at = None
+        logger.error(f"Outbox #{entry.id} ({entry.idempotency_key}) не доставлен: {error}")
+    else:
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** (entry.attempts - 1)))
+        entry.next_attempt_at = now + timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def deliver_pending(bitrix, limit: int = 500) -> Dict[str, int]:
+    """
+    Отправить накопившиеся вызовы пачками batch по BATCH_LIMIT команд.
+
+    Доставка «не менее одного раза»: отправленная запись больше не
+    повторяется, неудачные уходят на повтор с экспоненциальной задержкой.
+    """
+    stats = {'sent': 0, 'retry': 0, 'failed': 0}
+    entries = _claim(limit)
+
+    for offset in range(0, len(entries), BATCH_LIMIT):
+        chunk = entries[offset:offset + BATCH_LIMIT]
+        commands = {}
+        now = timezone.now()
+        for entry in chunk:
+            try:
+                commands[f'o{entry.id}'] = _command(entry)
+            except ValueError as e:
+                entry.attempts = MAX_ATTEMPTS - 1
+                _mark_retry(entry, str(e), now)
+
+        response = bitrix.call_batch(commands) if commands else {}
+        now = timezone.now()
+        results = response.get('result') or {}
+        errors = response.get('result_error') or {}
+
+        for entry in chunk:
+            key = f'o{entry.id}'
+            if key not in commands:
+                pass
+            elif 'error' in response:
+                _mark_retry(entry, f"{response['error']}: {response.get('error_description', '')}", now)
+            elif key in results:
+                entry.status = 'sent'
+                entry.sent_at = now
+                entry.result = results[key]
+                entry.next_attempt_at = None
+                entry.last_error = ''
+            else:
+                _mark_retry(entry, str(errors.get(key, 'Нет ответа на команду')), now)
+
+            entry.updated_at = now
+            if entry.status == 'sent':
+                stats['sent'] += 1
+            elif entry.status == 'failed':
+                stats['failed'] += 1
+            else:
+                stats['retry'] += 1
+
+        BitrixOutbox.objects.bulk_update(
+            chunk,
+            ['status', 'attempts', 'next_attempt_at', 'last_error', 'result', 'sent_at', 'updated_at'],
+        )
+
+    return stats
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# ============================================
+# Кэш stale-while-revalidate и предохранитель для внешних API
+# ============================================
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с двумя сроками жизни.
+
+    Запись свежая ttl секунд; после этого еще stale_ttl секунд ее можно
+    отдавать как устаревшую, пока значение обновляется в фоне или пока
+    источник недоступен. Старые записи вытесняются по LRU сверх maxsize.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300, stale_ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def lookup(self, key: Hashable) -> Tuple[Any, Optional[float]]:
+        """Вернуть (значение, возраст в секундах) или (_MISSING, None), если записи нет или она протухла"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING, None
+            stored_at, value = item
+            age = time.monotonic() - stored_at
+            if age > self.ttl + self.stale_ttl:
+                del self._data[key]
+                return _MISSING, None
+            self._data.move_to_end(key)
+            return value, age
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Tuple[bool, Any]]) -> Any:
+        """
+        Отдать значение по ключу, при необходимости загрузив его.
+
+        loader возвращает (успех, значение). Свежая запись отдается сразу;
+        устаревшая отдается сразу, а в фоне запускается обновление; при
+        промахе значение грузится синхронно. Если загрузка не удалась,
+        но есть устаревшая запись, отдается она.
+        """
+        value, age = self.lookup(key)
+        if value is not _MISSING and age <= self.ttl:
+            self.hits += 1
+            return value
+        if value is not _MISSING:
+            self.stale_hits += 1
+            self._refresh_in_background(key, loader)
+            return value
+
+        self.misses += 1
+        ok, loaded = loader()
+        if ok:
+            self.set(key, loaded)
+        return loaded
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Tuple[bool, Any]]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                ok, loaded = loader()
+                if ok:
+                    self.set(key, loaded)
+                    self.refreshes += 1
+                else:
+                    self.refresh_failures += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='cache-refresh', daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Показатели для мониторинга"""
+        with self._lock:
+            now = time.monotonic()
+            size = len(self._data)
+            stale = sum(1 for stored_at, _ in self._data.values() if now - stored_at > self.ttl)
+            oldest = max((now - stored_at for stored_at, _ in self._data.values()), default=0)
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'size': size,
+            'stale_entries': stale,
+            'oldest_age': round(oldest, 1),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+            'refreshes': self.refreshes,
+            'refresh_failures': self.refresh_failures,
+        }
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold ошибок подряд размыкается и сразу
+    отказывает, через reset_timeout секунд пропускает один пробный вызов —
+    если тот успешен, замыкается снова.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Можно ли сейчас обращаться к источнику"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Показатели для мониторинга"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'open_for': round(time.monotonic() - self.opened_at, 1) if self.opened_at else None,
+                'rejected': self.rejected,
+                'trips': self.trips,
+            }
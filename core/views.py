@@ -1,3 +1,11 @@
-from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from core.services.bitrix import get_bitrix_health
 
-# Create your views here.
+
+@login_required
+def bitrix_health(request):
+    """Состояние интеграции с Битрикс24: предохранитель и кэши (для мониторинга)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    return JsonResponse(get_bitrix_health())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import OnboardingTask, EmployeeOnboarding
+from .progress import set_task_completed
 
 @admin.register(OnboardingTask)
 class OnboardingTaskAdmin(admin.ModelAdmin):
@@ -9,4 +10,14 @@ class OnboardingTaskAdmin(admin.ModelAdmin):
 @admin.register(EmployeeOnboarding)
 class EmployeeOnboardingAdmin(admin.ModelAdmin):
     list_display = ['employee', 'task', 'is_completed']
-    list_filter = ['is_completed']
\ No newline at end of file
+    list_filter = ['is_completed']
+
+    def save_model(self, request, obj, form, change):
+        # Отметку выполнения меняем через сервис, чтобы сдвинулись счетчики сотрудника
+        if 'is_completed' in form.changed_data:
+            completed = obj.is_completed
+            obj.is_completed = not completed
+            super().save_model(request, obj, form, change)
+            set_task_completed(obj, completed)
+        else:
+            super().save_model(request, obj, form, change)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class OnboardingConfig(AppConfig):
     name = 'onboarding'
+
+    def ready(self):
+        # Счетчики прогресса следуют за задачами и строками чек-листов
+        from . import signals  # noqa: F401
@@ -0,0 +1,51 @@
+from typing import Iterable, List, Optional
+
+from django.db.models import Exists, OuterRef
+
+from users.models import Employee
+from .models import EmployeeOnboarding, OnboardingTask
+
+# Размер пачки для bulk_create строк чек-листов
+CHUNK_SIZE = 500
+
+
+def materialize_checklists(employee_ids: Iterable[int], task_ids: Optional[List[int]] = None,
+                           chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Создать недостающие строки чек-листов пачкой.
+
+    Пары (сотрудник, задача), которые уже есть, пропускает сама база
+    (ignore_conflicts по unique_together), поэтому вызов идемпотентен.
+    Возвращает число пар, отправленных в базу.
+    """
+    employee_ids = list(employee_ids)
+    if task_ids is None:
+        task_ids = list(OnboardingTask.objects.values_list('pk', flat=True))
+    if not employee_ids or not task_ids:
+        return 0
+
+    rows = [
+        EmployeeOnboarding(employee_id=employee_id, task_id=task_id)
+        for employee_id in employee_ids
+        for task_id in task_ids
+    ]
+    EmployeeOnboarding.objects.bulk_create(rows, batch_size=chunk_size, ignore_conflicts=True)
+    return len(rows)
+
+
+def load_checklist(employee: Employee) -> List[EmployeeOnboarding]:
+    """Чек-лист сотрудника с задачами одним JOIN; недостающие строки создаются одним INSERT"""
+    missing = list(
+        OnboardingTask.objects
+        .filter(~Exists(EmployeeOnboarding.objects.filter(employee=employee, task=OuterRef('pk'))))
+        .values_list('pk', flat=True)
+    )
+    if missing:
+        materialize_checklists([employee.pk], missing)
+
+    return list(
+        EmployeeOnboarding.objects
+        .filter(employee=employee)
+        .select_related('task')
+        .order_by('task__order', 'task__pk')
+    )
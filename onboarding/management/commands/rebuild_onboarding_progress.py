@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from onboarding.progress import rebuild_progress
+from onboarding.stats import invalidate_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересобрать счетчики прогресса онбординга по строкам чек-листов'
+
+    def handle(self, *args, **options):
+        updated = rebuild_progress()
+        invalidate_stats()
+        self.stdout.write(self.style.SUCCESS(f'Счетчики пересобраны для {updated} сотрудников'))
@@ -0,0 +1,224 @@
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, QuerySet, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from users.models import Employee
+from .models import EmployeeOnboarding, OnboardingTask
+
+# ============================================
+# Денормализованные счетчики прогресса
+# ============================================
+# Employee.onboarding_completed — число выполненных задач,
+# Employee.onboarding_completed_at — когда выполнена последняя из них
+# (None, пока чек-лист не закрыт). Счетчики двигаются F-выражениями
+# вместе с переключением задач, при расхождении их пересобирает
+# команда rebuild_onboarding_progress.
+
+
+def annotate_progress(queryset: Optional[QuerySet] = None) -> QuerySet:
+    """Добавить к сотрудникам completed_tasks — число выполненных задач (из счетчика, без JOIN)"""
+    if queryset is None:
+        queryset = Employee.objects.filter(is_active=True)
+    return queryset.annotate(completed_tasks=F('onboarding_completed'))
+
+
+def adjust_completed(employees: QuerySet, delta: int) -> int:
+    """Сдвинуть счетчик выполненных задач на delta, не уходя ниже нуля"""
+    if delta < 0:
+        employees = employees.filter(onboarding_completed__gte=-delta)
+    return employees.update(onboarding_completed=F('onboarding_completed') + delta)
+
+
+def refresh_completion(employees: Optional[QuerySet] = None, total_tasks: Optional[int] = None) -> int:
+    """
+    Пересчитать отметку завершения по счетчику одним UPDATE.
+
+    Нужна, когда меняется число задач или счетчик сотрудника: у закрывших
+    чек-лист сохраняется прежняя отметка (или ставится текущее время),
+    у остальных сбрасывается.
+    """
+    if employees is None:
+        employees = Employee.objects.all()
+    if total_tasks is None:
+        total_tasks = OnboardingTask.objects.count()
+    if not total_tasks:
+        return employees.exclude(onboarding_completed_at=None).update(onboarding_completed_at=None)
+    return employees.update(onboarding_completed_at=Case(
+        When(onboarding_completed__gte=total_tasks,
+             then=Coalesce(F('onboarding_completed_at'), Value(timezone.now()))),
+        default=Value(None),
+    ))
+
+
+def set_task_completed(progress: EmployeeOnboarding, completed: bool) -> Dict:
+    """
+    Отметить задачу чек-листа и сдвинуть счетчики сотрудника в одной транзакции.
+
+    Строка меняется условным UPDATE только при реальной смене состояния,
+    поэтому повторный или параллельный клик не сдвигает счетчик дважды.
+    Возвращает актуальные счетчики сотрудника.
+    """
+    now = timezone.now()
+    employees = Employee.objects.filter(pk=progress.employee_id)
+    with transaction.atomic():
+        changed = EmployeeOnboarding.objects.filter(pk=progress.pk, is_completed=not completed).update(
+            is_completed=completed, completed_at=now if completed else None, updated_at=now
+        )
+        if changed:
+            adjust_completed(employees, 1 if completed else -1)
+            refresh_completion(employees)
+        counters = employees.values('onboarding_completed', 'onboarding_completed_at').get()
+
+    progress.is_completed = completed
+    if changed:
+        progress.completed_at = now if completed else None
+    return {
+        'changed': bool(changed),
+        'completed': counters['onboarding_completed'],
+        'completed_at': counters['onboarding_completed_at'],
+    }
+
+
+def set_tasks_completed(changes: Dict[int, bool], employees: Optional[QuerySet] = None,
+                        chunk_size: int = 500) -> Dict:
+    """
+    Пакетная отметка задач чек-листов: {ID строки EmployeeOnboarding: выполнено}.
+
+    В одной транзакции строки читаются и меняются условными UPDATE по
+    сотруднику и направлению (только те, чье состояние реально меняется).
+    Сдвиг счетчика берется из числа строк, которые UPDATE действительно
+    изменил, поэтому параллельный клик не посчитается дважды; счетчики
+    сдвигаются одним UPDATE на каждую величину сдвига.
+    employees — ограничить изменения строками этих сотрудников (чужие
+    считаются ненайденными). Возвращает число измененных строк,
+    ненайденные ID и счетчики затронутых сотрудников.
+    """
+    ids = list(changes)
+    rows = EmployeeOnboarding.objects.all()
+    if employees is not None:
+        rows = rows.filter(employee__in=employees)
+    now = timezone.now()
+    with transaction.atomic():
+        current = {}
+        for offset in range(0, len(ids), chunk_size):
+            current.update({
+                pk: (employee_id, is_completed)
+                for pk, employee_id, is_completed in rows
+                .select_for_update()
+                .filter(pk__in=ids[offset:offset + chunk_size])
+                .values_list('pk', 'employee_id', 'is_completed')
+            })
+
+        flips = defaultdict(list)
+        for pk, completed in changes.items():
+            if pk in current and current[pk][1] != completed:
+                flips[current[pk][0], completed].append(pk)
+
+        changed = 0
+        deltas = Counter()
+        for (employee_id, completed), pks in flips.items():
+            for offset in range(0, len(pks), chunk_size):
+                flipped = EmployeeOnboarding.objects.filter(
+                    pk__in=pks[offset:offset + chunk_size], employee_id=employee_id, is_completed=not completed
+                ).update(is_completed=completed, completed_at=now if completed else None, updated_at=now)
+                changed += flipped
+                deltas[employee_id] += flipped if completed else -flipped
+
+        by_delta = defaultdict(list)
+        for employee_id, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(employee_id)
+        for delta, employee_ids in by_delta.items():
+            adjust_completed(Employee.objects.filter(pk__in=employee_ids), delta)
+
+        employee_ids = sorted({employee_id for employee_id, _ in current.values()})
+        if deltas:
+            refresh_completion(Employee.objects.filter(pk__in=list(deltas)))
+        counters = {
+            row['pk']: {'completed': row['onboarding_completed'], 'completed_at': row['onboarding_completed_at']}
+            for row in Employee.objects.filter(pk__in=employee_ids)
+            .values('pk', 'onboarding_completed', 'onboarding_completed_at')
+        }
+
+    return {
+        'changed': changed,
+        'missing': [pk for pk in ids if pk not in current],
+        'employees': counters,
+    }
+
+
+def rebuild_progress(employees: Optional[QuerySet] = None) -> int:
+    """Пересобрать счетчики по строкам EmployeeOnboarding (починка после расхождений)"""
+    if employees is None:
+        employees = Employee.objects.all()
+    completed = (
+        EmployeeOnboarding.objects
+        .filter(employee=OuterRef('pk'), is_completed=True)
+        .order_by().values('employee')
+        .annotate(total=Count('pk')).values('total')
+    )
+    last_completed = (
+        EmployeeOnboarding.objects
+        .filter(employee=OuterRef('pk'), is_completed=True)
+        .order_by('-completed_at').values('completed_at')[:1]
+    )
+    with transaction.atomic():
+        updated = employees.update(
+            onboarding_completed=Coalesce(Subquery(completed, output_field=IntegerField()), 0),
+            onboarding_completed_at=None,
+        )
+        total_tasks = OnboardingTask.objects.count()
+        if total_tasks:
+            employees.filter(onboarding_completed__gte=total_tasks).update(
+                onboarding_completed_at=Coalesce(Subquery(last_completed), Value(timezone.now()))
+            )
+    return updated
+
+
+def progress_percent(completed: int, total_tasks: int) -> int:
+    """Процент выполнения чек-листа"""
+    return int((completed / total_tasks) * 100) if total_tasks else 0
+
+
+def progress_row(employee: Employee, total_tasks: int) -> Dict:
+    """Строка прогресса для шаблонов дашбордов"""
+    return {
+        'employee': employee,
+        'name': employee.name,
+        'progress': progress_percent(employee.completed_tasks, total_tasks),
+        'completed': employee.completed_tasks,
+        'total': total_tasks,
+    }
+
+
+def progress_buckets(queryset: Optional[QuerySet] = None, total_tasks: Optional[int] = None) -> Dict[str, int]:
+    """
+    Сколько сотрудников завершили онбординг, в процессе и не начали.
+
+    Считается одним агрегатом по индексированному счетчику, без JOIN.
+    """
+    if total_tasks is None:
+        total_tasks = OnboardingTask.objects.count()
+    if queryset is None:
+        queryset = Employee.objects.filter(is_active=True)
+    if not total_tasks:
+        return {'completed': 0, 'in_progress': 0, 'not_started': queryset.count()}
+    return queryset.aggregate(
+        completed=Count('pk', filter=Q(onboarding_completed__gte=total_tasks)),
+        in_progress=Count('pk', filter=Q(onboarding_completed__gt=0, onboarding_completed__lt=total_tasks)),
+        not_started=Count('pk', filter=Q(onboarding_completed=0)),
+    )
+
+
+def top_progress(limit: int = 10, descending: bool = True,
+                 queryset: Optional[QuerySet] = None, total_tasks: Optional[int] = None) -> List[Dict]:
+    """Первые limit сотрудников по прогрессу; сортировка и срез — на стороне БД"""
+    if total_tasks is None:
+        total_tasks = OnboardingTask.objects.count()
+    order = '-completed_tasks' if descending else 'completed_tasks'
+    employees = annotate_progress(queryset).order_by(order, 'name')[:limit]
+    return [progress_row(employee, total_tasks) for employee in employees]
@@ -0,0 +1,57 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import Employee
+from vacations.models import VacationRequest
+from .checklists import materialize_checklists
+from .models import EmployeeOnboarding, OnboardingTask
+from .progress import adjust_completed, refresh_completion
+from .stats import invalidate_stats
+
+
+@receiver(post_save, sender=OnboardingTask)
+def task_added(sender, instance, created, **kwargs):
+    """Новая задача: у закрывших чек-лист он снова открыт, активным сразу добавляется строка"""
+    if created:
+        refresh_completion()
+        materialize_checklists(
+            Employee.objects.filter(is_active=True).values_list('pk', flat=True).iterator(),
+            [instance.pk],
+        )
+
+
+@receiver(pre_delete, sender=OnboardingTask)
+def task_removing(sender, instance, **kwargs):
+    """Удаляется задача: вычесть ее у всех, кто успел ее выполнить (одним UPDATE)"""
+    adjust_completed(
+        Employee.objects.filter(onboarding__task=instance, onboarding__is_completed=True), -1
+    )
+
+
+@receiver(post_delete, sender=OnboardingTask)
+def task_removed(sender, instance, **kwargs):
+    """Задач стало меньше: часть сотрудников могла закрыть чек-лист"""
+    refresh_completion()
+
+
+@receiver(post_delete, sender=EmployeeOnboarding)
+def progress_removed(sender, instance, origin=None, **kwargs):
+    """Удалена отдельная строка чек-листа (каскады от задачи и сотрудника учтены выше или не нужны)"""
+    if getattr(origin, 'model', type(origin)) is not EmployeeOnboarding or not instance.is_completed:
+        return
+    employees = Employee.objects.filter(pk=instance.employee_id)
+    adjust_completed(employees, -1)
+    refresh_completion(employees)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=EmployeeOnboarding)
+@receiver(post_delete, sender=EmployeeOnboarding)
+@receiver(post_save, sender=VacationRequest)
+@receiver(post_delete, sender=VacationRequest)
+@receiver(post_save, sender=OnboardingTask)
+@receiver(post_delete, sender=OnboardingTask)
+def stats_changed(sender, **kwargs):
+    """Данные для /api/stats/ изменились — снимок пересчитается при следующем запросе"""
+    invalidate_stats()
@@ -0,0 +1,63 @@
+import hashlib
+import json
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from vacations.models import VacationRequest
+from .models import OnboardingTask
+from .progress import progress_buckets
+
+# ============================================
+# Снимок живой статистики для главной (/api/stats/)
+# ============================================
+# Считается несколькими агрегатными запросами и кладется в кэш вместе с ETag.
+# Снимок сбрасывается сигналами моделей и явными вызовами из массовых
+# операций (UPDATE и bulk_* сигналов не шлют); в ключе дата, чтобы
+# «в отпуске сегодня» не пережило полночь.
+
+STATS_CACHE_PREFIX = 'onboarding:api_stats'
+
+
+def stats_cache_key() -> str:
+    return f"{STATS_CACHE_PREFIX}:{timezone.localdate().isoformat()}"
+
+
+def compute_stats() -> Dict[str, int]:
+    """Статистика для главной: три запроса вместо обхода всех сотрудников"""
+    total_tasks = OnboardingTask.objects.count()
+    buckets = progress_buckets(total_tasks=total_tasks)
+    today = timezone.localdate()
+    on_vacation = VacationRequest.objects.filter(
+        status='approved', start_date__lte=today, end_date__gte=today
+    ).count()
+    return {
+        'total_employees': sum(buckets.values()),
+        'in_onboarding': buckets['in_progress'],
+        'on_vacation': on_vacation,
+        'completed_onboarding': buckets['completed'],
+    }
+
+
+def get_stats_snapshot() -> Dict:
+    """Снимок из кэша или свежий: {'data': ..., 'etag': ..., 'generated_at': ...}"""
+    key = stats_cache_key()
+    snapshot = cache.get(key)
+    if snapshot is None:
+        data = compute_stats()
+        payload = json.dumps(data, sort_keys=True).encode('utf-8')
+        snapshot = {
+            'data': data,
+            'etag': hashlib.sha256(payload).hexdigest()[:32],
+            'generated_at': timezone.now(),
+        }
+        cache.set(key, snapshot, settings.STATS_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_stats(**kwargs):
+    """Сбросить снимок после коммита, чтобы не закэшировать незакоммиченное состояние"""
+    transaction.on_commit(lambda: cache.delete(stats_cache_key()))
@@ -1,3 +1,117 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.test import Client, TestCase
+
+from users.models import Employee
+from .checklists import materialize_checklists
+from .models import EmployeeOnboarding, OnboardingTask
+from .progress import rebuild_progress, set_task_completed, set_tasks_completed
+
+
+class ToggleTasksTests(TestCase):
+    """Пакетная отметка задач: счетчик сотрудника совпадает с числом выполненных строк"""
+
+    def setUp(self):
+        self.tasks = [OnboardingTask.objects.create(title=f'Задача {index}', order=index) for index in range(3)]
+        self.user = User.objects.create_user('newbie', password='secret')
+        self.employee = Employee.objects.create(bitrix_id=1, name='Новичок', user=self.user)
+        self.other = Employee.objects.create(bitrix_id=2, name='Коллега')
+        materialize_checklists([self.employee.pk, self.other.pk])
+        self.rows = list(EmployeeOnboarding.objects.filter(employee=self.employee).order_by('task__order'))
+        self.other_rows = list(EmployeeOnboarding.objects.filter(employee=self.other))
+
+    def assertCounterConsistent(self, employee):
+        employee.refresh_from_db()
+        actual = EmployeeOnboarding.objects.filter(employee=employee, is_completed=True).count()
+        self.assertEqual(employee.onboarding_completed, actual)
+        return employee
+
+    def test_batch_moves_counters_by_real_changes(self):
+        set_task_completed(self.rows[0], True)
+        result = set_tasks_completed({
+            self.rows[0].pk: True, self.rows[1].pk: True, self.rows[2].pk: True, 999999: True,
+        })
+
+        self.assertEqual(result['changed'], 2)
+        self.assertEqual(result['missing'], [999999])
+        employee = self.assertCounterConsistent(self.employee)
+        self.assertEqual(employee.onboarding_completed, 3)
+        self.assertIsNotNone(employee.onboarding_completed_at)
+
+        set_tasks_completed({self.rows[1].pk: False})
+        employee = self.assertCounterConsistent(self.employee)
+        self.assertIsNone(employee.onboarding_completed_at)
+
+    def test_concurrent_toggle_is_counted_once(self):
+        row = self.rows[0]
+        original = QuerySet.values_list
+        raced = []
+
+        def values_list_with_race(queryset, *args, **kwargs):
+            result = list(original(queryset, *args, **kwargs))
+            if not raced:
+                # Между чтением и записью ту же задачу отмечает другой запрос
+                raced.append(True)
+                set_task_completed(EmployeeOnboarding.objects.get(pk=row.pk), True)
+            return result
+
+        with mock.patch.object(QuerySet, 'values_list', values_list_with_race):
+            result = set_tasks_completed({row.pk: True})
+
+        self.assertEqual(result['changed'], 0)
+        self.assertEqual(self.assertCounterConsistent(self.employee).onboarding_completed, 1)
+
+    def test_rebuild_matches_counters(self):
+        set_tasks_completed({row.pk: True for row in self.rows[:2]})
+        Employee.objects.update(onboarding_completed=0)
+        rebuild_progress()
+        self.assertEqual(self.assertCounterConsistent(self.employee).onboarding_completed, 2)
+
+
+class ToggleTasksViewTests(TestCase):
+    """API пакетной отметки: CSRF, только JSON, сотрудник меняет только свой чек-лист"""
+
+    def setUp(self):
+        OnboardingTask.objects.create(title='Задача')
+        self.user = User.objects.create_user('newbie', password='secret')
+        self.employee = Employee.objects.create(bitrix_id=1, name='Новичок', user=self.user)
+        self.other = Employee.objects.create(bitrix_id=2, name='Коллега')
+        materialize_checklists([self.employee.pk, self.other.pk])
+        self.own_row = EmployeeOnboarding.objects.get(employee=self.employee)
+        self.other_row = EmployeeOnboarding.objects.get(employee=self.other)
+        self.client.login(username='newbie', password='secret')
+
+    def post(self, changes, client=None, **extra):
+        return (client or self.client).post(
+            '/onboarding/api/toggle-tasks/',
+            json.dumps({'changes': [{'id': pk, 'completed': True} for pk in changes]}),
+            content_type='application/json', **extra,
+        )
+
+    def test_employee_changes_only_own_rows(self):
+        response = self.post([self.own_row.pk, self.other_row.pk])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], 1)
+        self.assertEqual(response.json()['missing'], [self.other_row.pk])
+        self.other_row.refresh_from_db()
+        self.assertFalse(self.other_row.is_completed)
+
+    def test_staff_changes_any_rows(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.post([self.own_row.pk, self.other_row.pk]).json()['changed'], 2)
+
+    def test_requires_json(self):
+        response = self.client.post(
+            '/onboarding/api/toggle-tasks/', '{"changes": []}', content_type='text/plain'
+        )
+        self.assertEqual(response.status_code, 415)
+
+    def test_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='newbie', password='secret')
+        self.assertEqual(self.post([self.own_row.pk], client=client).status_code, 403)
@@ -7,4 +7,5 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('employee/<int:employee_id>/', views.employee_checklist, name='employee_checklist'),
     path('api/toggle-task/<int:task_id>/', views.toggle_task, name='toggle_task'),
+    path('api/toggle-tasks/', views.toggle_tasks, name='toggle_tasks'),
 ]
\ No newline at end of file
@@ -1,15 +1,21 @@
 from django.db.models import Count, Q
 from django.utils import timezone
-from vacations.models import VacationRequest
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
 from users.models import Employee
 from .models import OnboardingTask, EmployeeOnboarding
+from .checklists import load_checklist
+from .progress import (
+    annotate_progress, progress_buckets, progress_percent, progress_row, set_task_completed, set_tasks_completed,
+)
+from .stats import get_stats_snapshot, invalidate_stats
 import json
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 
 @login_required
@@ -29,40 +35,16 @@ def dashboard(request):
     # Прогресс онбординга
     total_tasks = OnboardingTask.objects.count()
 
-    # Сотрудники с их прогрессом
-    employees_data = []
-    employees = Employee.objects.filter(is_active=True)
+    # Сотрудники с их прогрессом: один запрос с GROUP BY,
+    # сначала те, у кого меньше
+    employees = annotate_progress().order_by('completed_tasks', 'name')
+    employees_data = [progress_row(employee, total_tasks) for employee in employees]
 
-    completed_onboarding = 0
-    in_progress = 0
+    buckets = progress_buckets(total_tasks=total_tasks)
+    completed_onboarding = buckets['completed']
+    in_progress = buckets['in_progress']
 
-    for employee in employees:
-        completed_tasks = EmployeeOnboarding.objects.filter(
-            employee=employee,
-            is_completed=True
-        ).count()
-
-        if total_tasks > 0:
-            progress = int((completed_tasks / total_tasks) * 100)
-
-            if progress == 100:
-                completed_onboarding += 1
-            elif progress > 0:
-                in_progress += 1
-        else:
-            progress = 0
-
-        employees_data.append({
-            'employee': employee,
-            'progress': progress,
-            'completed': completed_tasks,
-            'total': total_tasks,
-        })
-
-    # Сортируем по прогрессу (сначала те, у кого меньше)
-    employees_data.sort(key=lambda x: x['progress'])
-
-    # Берём топ-5 самых новых
+    # Берём топ-5 с наименьшим прогрессом
     recent_employees = employees_data[:5]
 
     context = {
@@ -70,6 +52,9 @@ def dashboard(request):
         'new_employees': new_employees,
         'completed_onboarding': completed_onboarding,
         'in_progress': in_progress,
+        'completed_count': completed_onboarding,
+        'in_progress_count': in_progress,
+        'not_started_count': buckets['not_started'],
         'employees': employees_data,
         'recent_employees': recent_employees,
         'total_tasks': total_tasks,
@@ -82,22 +67,14 @@ def employee_checklist(request, employee_id):
     """Чек-лист для конкретного сотрудника"""
     employee = get_object_or_404(Employee, id=employee_id)
     
-    # Получаем все задачи
-    tasks = OnboardingTask.objects.all()
-    
-    # Получаем или создаем прогресс по задачам
-    checklist = []
-    for task in tasks:
-        progress, created = EmployeeOnboarding.objects.get_or_create(
-            employee=employee,
-            task=task,
-            defaults={'is_completed': False}
-        )
-        checklist.append({
-            'task': task,
+    checklist = [
+        {
+            'task': progress.task,
             'completed': progress.is_completed,
             'progress_id': progress.id,
-        })
+        }
+        for progress in load_checklist(employee)
+    ]
     
     return render(request, 'onboarding/checklist.html', {
         'employee': employee,
@@ -112,63 +89,76 @@ def toggle_task(request, task_id):
         try:
             data = json.loads(request.body)
             progress = get_object_or_404(EmployeeOnboarding, id=task_id)
+            counters = set_task_completed(progress, bool(data.get('completed', False)))
+            if counters['changed']:
+                invalidate_stats()
             
-            progress.is_completed = data.get('completed', False)
-            if progress.is_completed:
-                progress.completed_at = datetime.now()
-            else:
-                progress.completed_at = None
-            progress.save()
-            
-            return JsonResponse({'success': True})
+            return JsonResponse({
+                'success': True,
+                'completed': counters['completed'],
+                'total': OnboardingTask.objects.count(),
+            })
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
     return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
 
 
-def api_stats(request):
-    """API для живой статистики на главной"""
+# Сколько изменений принимает один пакетный запрос
+TOGGLE_BATCH_LIMIT = 1000
 
-    total_employees = Employee.objects.filter(is_active=True).count()
 
-    # Сотрудники в онбординге (прогресс < 100% и > 0%)
-    in_onboarding = 0
-    for emp in Employee.objects.filter(is_active=True):
-        total_tasks = OnboardingTask.objects.count()
-        if total_tasks > 0:
-            completed = EmployeeOnboarding.objects.filter(
-                employee=emp, is_completed=True
-            ).count()
-            if completed < total_tasks and completed > 0:
-                in_onboarding += 1
-
-    # Сотрудники в отпуске сейчас
-    today = timezone.now().date()
-    on_vacation = 0
+@login_required
+def toggle_tasks(request):
+    """
+    API для пакетной отметки задач: {"changes": [{"id": 1, "completed": true}, ...]}.
+
+    Только JSON с заголовком X-CSRFToken. HR меняет любые чек-листы,
+    сотрудник — только свой (чужие строки попадут в missing).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
+    if request.content_type != 'application/json':
+        return JsonResponse({'success': False, 'error': 'Expected application/json'}, status=415)
+
     try:
-        on_vacation = VacationRequest.objects.filter(
-            status='approved',
-            start_date__lte=today,
-            end_date__gte=today
-        ).count()
-    except:
-        pass  # Если модель ещё не создана
-
-    # Завершившие онбординг
-    completed_onboarding = 0
-    for emp in Employee.objects.filter(is_active=True):
-        total_tasks = OnboardingTask.objects.count()
-        if total_tasks > 0:
-            completed = EmployeeOnboarding.objects.filter(
-                employee=emp, is_completed=True
-            ).count()
-            if completed == total_tasks:
-                completed_onboarding += 1
+        data = json.loads(request.body)
+        changes = {int(item['id']): bool(item.get('completed', False)) for item in data['changes']}
+    except (ValueError, KeyError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid payload: {e}'}, status=400)
+    if len(changes) > TOGGLE_BATCH_LIMIT:
+        return JsonResponse(
+            {'success': False, 'error': f'Too many changes (max {TOGGLE_BATCH_LIMIT})'}, status=400
+        )
+
+    employees = None if request.user.is_staff else Employee.objects.filter(user=request.user)
+    result = set_tasks_completed(changes, employees=employees)
+    if result['changed']:
+        invalidate_stats()
 
+    total_tasks = OnboardingTask.objects.count()
     return JsonResponse({
-        'total_employees': total_employees,
-        'in_onboarding': in_onboarding,
-        'on_vacation': on_vacation,
-        'completed_onboarding': completed_onboarding,
-    })
\ No newline at end of file
+        'success': True,
+        'changed': result['changed'],
+        'missing': result['missing'],
+        'total': total_tasks,
+        'employees': [
+            {
+                'employee_id': employee_id,
+                'completed': counters['completed'],
+                'progress': progress_percent(counters['completed'], total_tasks),
+                'completed_at': counters['completed_at'],
+            }
+            for employee_id, counters in result['employees'].items()
+        ],
+    })
+
+
+@condition(etag_func=lambda request: get_stats_snapshot()['etag'])
+def api_stats(request):
+    """API для живой статистики на главной (снимок из кэша, 304 по ETag)"""
+    snapshot = get_stats_snapshot()
+    response = JsonResponse(snapshot['data'])
+    # Браузер каждый раз переспрашивает, но при совпадении ETag получает пустой 304
+    patch_cache_control(response, no_cache=True)
+    return response
@@ -66,9 +66,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Ожидание блокировки на запись, пока ее держит другой процесс (например, sync_users)
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Кэш снимков статистики. При нескольких процессах нужен общий бэкенд
+# (Redis/Memcached), иначе сброс снимка виден только в своем процессе
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'techtalenthub',
+    }
+}
+# Сколько живет снимок /api/stats/, даже если сигналы его не сбросили, с
+STATS_CACHE_TIMEOUT = int(os.getenv('STATS_CACHE_TIMEOUT', '300'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -105,6 +118,31 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Настройки для Bitrix24 (добавим позже)
 BITRIX24_WEBHOOK = os.getenv('BITRIX24_WEBHOOK', '')
+# application_token из настроек исходящего вебхука (проверяется у входящих событий)
+BITRIX24_APPLICATION_TOKEN = os.getenv('BITRIX24_APPLICATION_TOKEN', '')
+
+# Сетевые параметры клиента Bitrix24
+BITRIX24_CONNECT_TIMEOUT = float(os.getenv('BITRIX24_CONNECT_TIMEOUT', '5'))
+BITRIX24_READ_TIMEOUT = float(os.getenv('BITRIX24_READ_TIMEOUT', '30'))
+BITRIX24_POOL_SIZE = int(os.getenv('BITRIX24_POOL_SIZE', '10'))
+# Лимит Битрикса: ~2 запроса в секунду на портал
+BITRIX24_RATE_LIMIT = float(os.getenv('BITRIX24_RATE_LIMIT', '2'))
+BITRIX24_RATE_BURST = float(os.getenv('BITRIX24_RATE_BURST', '2'))
+BITRIX24_MAX_RETRIES = int(os.getenv('BITRIX24_MAX_RETRIES', '5'))
+BITRIX24_BACKOFF_BASE = float(os.getenv('BITRIX24_BACKOFF_BASE', '0.5'))
+BITRIX24_BACKOFF_MAX = float(os.getenv('BITRIX24_BACKOFF_MAX', '30'))
+# Кэш get_user/get_users: свежий TTL и сколько еще можно отдавать устаревшее
+BITRIX24_CACHE_SIZE = int(os.getenv('BITRIX24_CACHE_SIZE', '10000'))
+BITRIX24_CACHE_TTL = float(os.getenv('BITRIX24_CACHE_TTL', '300'))
+BITRIX24_CACHE_STALE_TTL = float(os.getenv('BITRIX24_CACHE_STALE_TTL', '3600'))
+# Предохранитель: после N ошибок подряд не ходим в Битрикс M секунд
+BITRIX24_BREAKER_THRESHOLD = int(os.getenv('BITRIX24_BREAKER_THRESHOLD', '5'))
+BITRIX24_BREAKER_RESET = float(os.getenv('BITRIX24_BREAKER_RESET', '30'))
+
+# Какая доля подразделения может быть в отпуске одновременно (проверка при утверждении)
+VACATION_MAX_ABSENT_SHARE = float(os.getenv('VACATION_MAX_ABSENT_SHARE', '0.3'))
+# Срок жизни ссылок на .ics-ленты в секундах (пусто — бессрочно, отзываются сменой ключа)
+VACATION_FEED_TOKEN_MAX_AGE = int(os.getenv('VACATION_FEED_TOKEN_MAX_AGE') or 0) or None
 
 # Куда перенаправлять неавторизованных пользователей
 LOGIN_URL = '/admin/login/'
@@ -5,6 +5,8 @@ from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from onboarding.views import api_stats
 from analytics.views import dashboard as analytics_dashboard
+from users.views import bitrix_events
+from core.views import bitrix_health
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -12,6 +14,8 @@ urlpatterns = [
 
     # API
     path('api/stats/', api_stats, name='api_stats'),
+    path('api/bitrix/events/', bitrix_events, name='bitrix_events'),
+    path('api/bitrix/health/', bitrix_health, name='bitrix_health'),
 
     # Основные разделы
     path('onboarding/', include('onboarding.urls')),
@@ -1,8 +1,20 @@
 from django.contrib import admin
-from .models import Employee
+from .models import Employee, SyncState, UserSyncEvent
+
 
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'email', 'position', 'hire_date', 'is_active']
-    list_filter = ['is_active', 'position']
-    search_fields = ['name', 'email']
\ No newline at end of file
+    list_display = ['name', 'email', 'position', 'department', 'hire_date', 'is_active']
+    list_filter = ['is_active', 'department', 'position']
+    search_fields = ['name', 'email']
+
+
+@admin.register(SyncState)
+class SyncStateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_synced_at', 'updated_at']
+
+
+@admin.register(UserSyncEvent)
+class UserSyncEventAdmin(admin.ModelAdmin):
+    list_display = ['bitrix_id', 'event', 'created_at', 'updated_at']
+    list_filter = ['event']
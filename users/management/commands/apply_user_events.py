@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from users.services.sync import apply_user_events
+from core.services.bitrix import get_bitrix_api
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Точечная синхронизация сотрудников по событиям Битрикс24 (полная sync_users — раз в сутки для сверки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--webhook', type=str, help='Bitrix24 webhook URL (опционально)')
+        parser.add_argument('--real', action='store_true', help='Использовать реальный API (если не указан, то заглушка)')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь один раз и выйти')
+        parser.add_argument('--interval', type=float, default=2, help='Пауза при пустой очереди, с')
+        parser.add_argument('--limit', type=int, default=100, help='Сколько событий брать за проход')
+
+    def handle(self, *args, **options):
+        bitrix = get_bitrix_api(webhook_url=options.get('webhook'), force_mock=not options.get('real'))
+        self.stdout.write('Обработчик событий Битрикс24 запущен')
+
+        try:
+            while True:
+                try:
+                    stats = apply_user_events(bitrix, limit=options['limit'])
+                except Exception:
+                    logger.exception("User events worker error")
+                    stats = {'upserted': 0, 'deactivated': 0, 'failed': 0}
+
+                if any(stats.values()):
+                    self.stdout.write(
+                        f"Обновлено {stats['upserted']}, деактивировано {stats['deactivated']}, "
+                        f"отложено из-за ошибок Битрикса {stats['failed']}"
+                    )
+                if options['once']:
+                    break
+                if sum(stats.values()) < options['limit']:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Обработчик остановлен')
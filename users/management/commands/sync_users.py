@@ -1,20 +1,34 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from users.models import Employee
-from core.services.bitrix import get_bitrix_api
+from django.db import transaction
+from django.utils import timezone
+from users.models import Employee, SyncState
+from users.services.sync import EmployeeSync, deactivate_missing, sync_in_shards
+from core.services.bitrix import MockBitrix24API, get_bitrix_api
 import logging
-from datetime import datetime
-import secrets
-import string
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
+SYNC_STATE_NAME = 'bitrix_users'
+# Фильтр Bitrix по дате изменения пользователя
+WATERMARK_FILTER = '>DATE_MODIFY'
+# Запас на расхождение часов и транзакции, закоммиченные во время прогона
+WATERMARK_OVERLAP = timedelta(minutes=2)
+
 class Command(BaseCommand):
     help = 'Синхронизация пользователей из Битрикс24 (или тестовых данных)'
 
     def add_arguments(self, parser):
         parser.add_argument('--webhook', type=str, help='Bitrix24 webhook URL (опционально)')
         parser.add_argument('--real', action='store_true', help='Использовать реальный API (если не указан, то заглушка)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Забрать только пользователей, измененных после прошлой успешной синхронизации')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить прерванный прогон с последней закоммиченной страницы')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Число параллельных потоков (шардов по диапазонам ID Битрикса)')
+        parser.add_argument('--list', action='store_true',
+                            help='В конце вывести список сотрудников в базе')
 
     def handle(self, *args, **options):
         self.stdout.write('Начинаем синхронизацию пользователей...')
@@ -26,86 +40,140 @@ class Command(BaseCommand):
                 webhook_url=options.get('webhook'),
                 force_mock=not use_real  # Если не real, то принудительно мок
             )
+            if isinstance(bitrix, MockBitrix24API):
+                self.stdout.write('🔧 Используется ЗАГЛУШКА Bitrix API (реальные запросы не отправляются)')
+            else:
+                self.stdout.write('🌐 Работаем с реальным Битрикс24')
 
-            users = bitrix.get_users()
+            state, _ = SyncState.objects.get_or_create(name=SYNC_STATE_NAME)
 
-            if not users:
-                self.stdout.write(self.style.WARNING('Нет пользователей для синхронизации'))
+            if options.get('resume') and (options.get('workers') or 1) > 1:
+                self.stdout.write(self.style.ERROR('--resume работает только в один поток'))
                 return
 
-            created = 0
-            updated = 0
-
-            for bitrix_user in users:
-                # Пропускаем неактивных
-                if bitrix_user.get('ACTIVE') is False:
-                    continue
-
-                # Получаем данные
-                bitrix_id = str(bitrix_user['ID'])
-                name = f"{bitrix_user.get('NAME', '')} {bitrix_user.get('LAST_NAME', '')}".strip()
-                email = bitrix_user.get('EMAIL', '')
-                position = bitrix_user.get('WORK_POSITION', '')
-
-                # Пытаемся извлечь дату приема
-                hire_date = None
-                if 'DATE_CREATE' in bitrix_user:
-                    try:
-                        hire_date = datetime.strptime(bitrix_user['DATE_CREATE'], '%Y-%m-%d').date()
-                    except:
-                        pass
-
-                if not name:
-                    name = bitrix_user.get('LOGIN', f'User_{bitrix_id}')
-
-                # Создаем или обновляем сотрудника
-                employee, created_flag = Employee.objects.update_or_create(
-                    bitrix_id=bitrix_id,
-                    defaults={
-                        'name': name,
-                        'email': email,
-                        'position': position,
-                        'hire_date': hire_date,
-                        'is_active': True,
-                    }
+            resume_after = None
+            if options.get('resume') and state.cursor is not None:
+                resume_after = state.cursor
+                # Вид прогона берется из прерванного, а не из флагов повторного запуска
+                incremental = state.run_kind == SyncState.INCREMENTAL
+                if incremental != bool(options.get('incremental')):
+                    self.stdout.write(self.style.WARNING(
+                        f'Прерванный прогон — {state.get_run_kind_display().lower()} синхронизация, продолжаем его'
+                    ))
+            else:
+                incremental = bool(options.get('incremental'))
+
+            filter_params = {}
+            if incremental:
+                if state.last_synced_at:
+                    since = timezone.localtime(state.last_synced_at - WATERMARK_OVERLAP)
+                    filter_params[WATERMARK_FILTER] = since.isoformat(timespec='seconds')
+                    self.stdout.write(f'Инкрементальный режим: изменения после {since:%d.%m.%Y %H:%M:%S}')
+                else:
+                    self.stdout.write(self.style.WARNING(
+                        'Прошлой успешной синхронизации нет, выполняем полную'
+                    ))
+            full_pass = not filter_params
+
+            if resume_after is not None:
+                # Страницы идут по возрастанию ID: все, что не больше курсора, уже в базе
+                started_at = state.run_started_at or timezone.now()
+                filter_params['>ID'] = resume_after
+                self.stdout.write(f'Продолжаем прерванный прогон после ID {resume_after}')
+            else:
+                if state.cursor is not None:
+                    self.stdout.write(self.style.WARNING(
+                        f'Прошлый прогон прерван на ID {state.cursor}, начинаем заново (см. --resume)'
+                    ))
+                started_at = timezone.now()
+                state.run_started_at = started_at
+                state.cursor = None
+                state.run_kind = SyncState.FULL if full_pass else SyncState.INCREMENTAL
+                state.save(update_fields=['run_started_at', 'cursor', 'run_kind', 'updated_at'])
+
+            workers = options.get('workers') or 1
+            if workers > 1:
+                syncer = self._sync_parallel(bitrix, filter_params, workers)
+            else:
+                syncer = self._sync_sequential(bitrix, filter_params, state, options['verbosity'])
+
+            # Сверка возможна, только если весь справочник пройден в этом прогоне
+            # или в прерванном и его продолжении
+            if full_pass and (syncer.seen_ids or resume_after is not None):
+                missing = deactivate_missing(
+                    syncer.seen_ids, after_id=resume_after, started_at=started_at, bitrix=bitrix
                 )
-
-                if created_flag:
-                    created += 1
-                    self.stdout.write(f'   ➕ Добавлен сотрудник: {name}')
-
-                    # Создаем пользователя Django для входа в админку
-                    username = f"bitrix_{bitrix_id}"
-                    user, user_created = User.objects.get_or_create(
-                        username=username,
-                        defaults={
-                            'email': email,
-                            'first_name': bitrix_user.get('NAME', ''),
-                            'last_name': bitrix_user.get('LAST_NAME', ''),
-                        }
-                    )
-                    if user_created:
-                        # Генерируем простой пароль для теста
-                        alphabet = string.ascii_letters + string.digits
-                        random_password = ''.join(secrets.choice(alphabet) for _ in range(10))
-                        user.set_password(random_password)
-                        user.save()
-                        self.stdout.write(f'      👤 Создан пользователь: {username} / {random_password}')
-
-                    employee.user = user
-                    employee.save()
+                syncer.deactivated += missing
+                if missing:
+                    self.stdout.write(f'   Деактивировано отсутствующих в Битриксе: {missing}')
+                if resume_after is not None:
+                    self.stdout.write(self.style.WARNING(
+                        f'Сверка после продолжения охватила ID больше {resume_after}; удаленные из '
+                        f'Битрикса сотрудники с меньшими ID выключатся при следующей полной синхронизации'
+                    ))
+
+            self._finish_run(state, started_at)
+
+            if not (syncer.created or syncer.changed or syncer.unchanged or syncer.deactivated):
+                if filter_params:
+                    self.stdout.write('Изменений нет')
                 else:
-                    updated += 1
+                    self.stdout.write(self.style.WARNING('Нет пользователей для синхронизации'))
+                return
 
             self.stdout.write(self.style.SUCCESS(
-                f'✅ Синхронизация завершена: создано {created}, обновлено {updated}'
+                f'✅ Синхронизация завершена: создано {syncer.created}, изменено {syncer.changed}, '
+                f'без изменений {syncer.unchanged}, деактивировано {syncer.deactivated}'
             ))
+            if syncer.created:
+                self.stdout.write(
+                    'Новым пользователям Django назначен неиспользуемый пароль, '
+                    'вход — через сброс пароля или Битрикс24'
+                )
 
-            # Показываем список сотрудников
-            self.stdout.write('\nСписок сотрудников в базе:')
-            for emp in Employee.objects.all():
-                self.stdout.write(f'  - {emp.name} ({emp.position})')
+            if options.get('list'):
+                self.stdout.write('\nСписок сотрудников в базе:')
+                for emp in Employee.objects.order_by('name').iterator():
+                    self.stdout.write(f'  - {emp.name} ({emp.position})')
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'❌ Ошибка синхронизации: {e}'))
-            logger.exception("Sync error")
\ No newline at end of file
+            logger.exception("Sync error")
+
+    def _sync_sequential(self, bitrix, filter_params, state, verbosity):
+        """Один поток: страница за страницей, с курсором для --resume"""
+        syncer = EmployeeSync()
+        for page in bitrix.iter_user_pages(filter_params or None):
+            # Каждая страница — своя транзакция вместе с курсором
+            with transaction.atomic():
+                created = syncer.sync(page)
+                state.cursor = max(int(user['ID']) for user in page)
+                state.save(update_fields=['cursor', 'updated_at'])
+
+            if verbosity >= 2:
+                for employee in created:
+                    self.stdout.write(f'   ➕ Добавлен сотрудник: {employee.name}')
+        return syncer
+
+    def _sync_parallel(self, bitrix, filter_params, workers):
+        """Несколько потоков по шардам ID; счетчики сводятся в один итог"""
+        total = EmployeeSync()
+        for (lo, hi), shard in sync_in_shards(bitrix, filter_params, workers):
+            self.stdout.write(
+                f'   Шард ID {lo}–{hi}: создано {shard.created}, изменено {shard.changed}, '
+                f'без изменений {shard.unchanged}, деактивировано {shard.deactivated}'
+            )
+            total.created += shard.created
+            total.changed += shard.changed
+            total.unchanged += shard.unchanged
+            total.deactivated += shard.deactivated
+            total.seen_ids |= shard.seen_ids
+        return total
+
+    def _finish_run(self, state, started_at):
+        """Запомнить момент начала успешного прогона как новую водяную метку и сбросить курсор"""
+        state.last_synced_at = started_at
+        state.run_started_at = None
+        state.cursor = None
+        state.run_kind = ''
+        state.save(update_fields=['last_synced_at', 'run_started_at', 'cursor', 'run_kind', 'updated_at'])
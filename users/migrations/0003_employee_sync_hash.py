@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_syncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='sync_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Отпечаток данных Битрикс24'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_employee_sync_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='cursor',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Последний закоммиченный ID'),
+        ),
+        migrations.AddField(
+            model_name='syncstate',
+            name='run_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Начало незавершенного прогона'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_syncstate_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSyncEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bitrix_id', models.IntegerField(unique=True, verbose_name='ID в Битрикс24')),
+                ('event', models.CharField(choices=[('upsert', 'Добавлен или изменен'), ('delete', 'Удален')], default='upsert', max_length=10, verbose_name='Событие')),
+            ],
+            options={
+                'verbose_name': 'Событие синхронизации',
+                'verbose_name_plural': 'События синхронизации',
+            },
+        ),
+    ]
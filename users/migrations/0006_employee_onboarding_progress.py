@@ -0,0 +1,59 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
+
+
+def backfill_onboarding_progress(apps, schema_editor):
+    """Заполнить счетчики по уже существующему прогрессу"""
+    Employee = apps.get_model('users', 'Employee')
+    EmployeeOnboarding = apps.get_model('onboarding', 'EmployeeOnboarding')
+    OnboardingTask = apps.get_model('onboarding', 'OnboardingTask')
+
+    completed = (
+        EmployeeOnboarding.objects
+        .filter(employee=OuterRef('pk'), is_completed=True)
+        .order_by().values('employee')
+        .annotate(total=Count('pk')).values('total')
+    )
+    Employee.objects.update(
+        onboarding_completed=Coalesce(Subquery(completed, output_field=IntegerField()), 0)
+    )
+    total_tasks = OnboardingTask.objects.count()
+    if total_tasks:
+        last_completed = (
+            EmployeeOnboarding.objects
+            .filter(employee=OuterRef('pk'), is_completed=True)
+            .order_by('-completed_at').values('completed_at')[:1]
+        )
+        Employee.objects.filter(onboarding_completed__gte=total_tasks).update(
+            onboarding_completed_at=Coalesce(Subquery(last_completed), Now())
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_usersyncevent'),
+        ('onboarding', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='onboarding_completed',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Выполнено задач онбординга'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='onboarding_completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Онбординг завершен'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['is_active', 'onboarding_completed'], name='employee_onboarding_idx'),
+        ),
+        migrations.RunPython(backfill_onboarding_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_employee_onboarding_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='department',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='ID подразделения в Битрикс24'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_employee_department'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='run_kind',
+            field=models.CharField(blank=True, choices=[('full', 'Полная'), ('incremental', 'Инкрементальная')], max_length=15, verbose_name='Вид незавершенного прогона'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_syncstate_run_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='feed_key',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='Ключ подписки на календарь'),
+        ),
+    ]
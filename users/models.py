@@ -11,11 +11,73 @@ class Employee(TimeStampedModel):
     email = models.EmailField(verbose_name="Email")
     position = models.CharField(max_length=255, blank=True, verbose_name="Должность")
     hire_date = models.DateField(null=True, blank=True, verbose_name="Дата приема")
+    department = models.IntegerField(null=True, blank=True, db_index=True,
+                                     verbose_name="ID подразделения в Битрикс24")
     is_active = models.BooleanField(default=True, verbose_name="Активен")
+    sync_hash = models.CharField(max_length=64, blank=True, editable=False,
+                                 verbose_name="Отпечаток данных Битрикс24")
+    # Денормализованный прогресс онбординга, ведется onboarding.progress
+    onboarding_completed = models.PositiveIntegerField(default=0, editable=False,
+                                                       verbose_name="Выполнено задач онбординга")
+    onboarding_completed_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                                   verbose_name="Онбординг завершен")
+    # Входит в токены подписки на календарь отпусков: смена ключа отзывает все выданные ссылки
+    feed_key = models.CharField(max_length=32, blank=True, editable=False,
+                                verbose_name="Ключ подписки на календарь")
 
     class Meta:
         verbose_name = "Сотрудник"
         verbose_name_plural = "Сотрудники"
+        indexes = [
+            # Фильтры дашбордов вида «активные, застрявшие на 0%»
+            models.Index(fields=['is_active', 'onboarding_completed'], name='employee_onboarding_idx'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class SyncState(TimeStampedModel):
+    """Состояние синхронизации с Битрикс24 (водяная метка последнего успешного прогона)"""
+    FULL = 'full'
+    INCREMENTAL = 'incremental'
+    RUN_KIND_CHOICES = [
+        (FULL, 'Полная'),
+        (INCREMENTAL, 'Инкрементальная'),
+    ]
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Синхронизация")
+    last_synced_at = models.DateTimeField(null=True, blank=True, verbose_name="Последняя успешная синхронизация")
+    # Незавершенный прогон: когда начат и до какого ID Битрикса данные уже закоммичены
+    run_started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало незавершенного прогона")
+    cursor = models.IntegerField(null=True, blank=True, verbose_name="Последний закоммиченный ID")
+    run_kind = models.CharField(max_length=15, choices=RUN_KIND_CHOICES, blank=True,
+                                verbose_name="Вид незавершенного прогона")
+
+    class Meta:
+        verbose_name = "Состояние синхронизации"
+        verbose_name_plural = "Состояния синхронизации"
+
+    def __str__(self):
+        return f"{self.name}: {self.last_synced_at or 'никогда'}"
+
+
+class UserSyncEvent(TimeStampedModel):
+    """Событие Битрикс24 о пользователе, ожидающее точечной синхронизации"""
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    EVENT_CHOICES = [
+        (UPSERT, 'Добавлен или изменен'),
+        (DELETE, 'Удален'),
+    ]
+
+    # Один ID — одна запись: повторные события схлопываются
+    bitrix_id = models.IntegerField(unique=True, verbose_name="ID в Битрикс24")
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES, default=UPSERT, verbose_name="Событие")
+
+    class Meta:
+        verbose_name = "Событие синхронизации"
+        verbose_name_plural = "События синхронизации"
+
+    def __str__(self):
+        return f"{self.bitrix_id}: {self.get_event_display()}"
@@ -0,0 +1,382 @@
+import hashlib
+import json
+import logging
+import queue
+import threading
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from core.services.bitrix import BitrixAPIError, BitrixUnavailableError
+from onboarding.checklists import materialize_checklists
+from onboarding.stats import invalidate_stats
+from users.models import Employee, UserSyncEvent
+
+logger = logging.getLogger(__name__)
+
+# Размер пачки для bulk_create / bulk_update
+CHUNK_SIZE = 500
+
+# Поля сотрудника, которые приходят из Битрикса
+EMPLOYEE_FIELDS = ['name', 'email', 'position', 'department', 'hire_date', 'is_active']
+
+
+def username_for(bitrix_id: int) -> str:
+    """Логин Django-пользователя для сотрудника из Битрикса"""
+    return f"bitrix_{bitrix_id}"
+
+
+def parse_bitrix_date(value) -> Optional[date]:
+    """Дата из Битрикса: '2024-02-01' или '2024-02-01T10:00:00+03:00'"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def parse_bitrix_department(value) -> Optional[int]:
+    """Основное подразделение: первое из UF_DEPARTMENT (список ID или одно значение)"""
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_bitrix_user(bitrix_user: Dict) -> Dict:
+    """Привести пользователя Битрикса к полям модели Employee"""
+    bitrix_id = int(bitrix_user['ID'])
+    first_name = bitrix_user.get('NAME') or ''
+    last_name = bitrix_user.get('LAST_NAME') or ''
+    name = f"{first_name} {last_name}".strip()
+    if not name:
+        name = bitrix_user.get('LOGIN') or f'User_{bitrix_id}'
+
+    return {
+        'bitrix_id': bitrix_id,
+        'name': name,
+        'email': bitrix_user.get('EMAIL') or '',
+        'position': bitrix_user.get('WORK_POSITION') or '',
+        'department': parse_bitrix_department(bitrix_user.get('UF_DEPARTMENT')),
+        'hire_date': parse_bitrix_date(bitrix_user.get('DATE_CREATE')),
+        'is_active': bitrix_user.get('ACTIVE') is not False,
+        'first_name': first_name,
+        'last_name': last_name,
+    }
+
+
+def fingerprint(record: Dict) -> str:
+    """Отпечаток нормализованных данных сотрудника: совпал — записывать нечего"""
+    payload = json.dumps(
+        {field: record[field] for field in ['bitrix_id'] + EMPLOYEE_FIELDS},
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EmployeeSync:
+    """
+    Пакетная синхронизация сотрудников.
+
+    Загружает существующих сотрудников одним запросом, сравнивает отпечатки
+    данных в памяти и записывает через bulk_create / bulk_update в транзакции
+    только новые и изменившиеся строки.
+    Новые Django-пользователи создаются пачкой с неиспользуемым паролем,
+    поэтому хеширование паролей не нужно.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.deactivated = 0
+        # Активные в Битриксе ID — для сверки с базой после полного прогона
+        self.seen_ids: Set[int] = set()
+
+    def sync(self, bitrix_users: List[Dict]) -> List[Employee]:
+        """Применить пользователей Битрикса к базе, вернуть созданных сотрудников"""
+        records = {}
+        for bitrix_user in bitrix_users:
+            record = normalize_bitrix_user(bitrix_user)
+            record['sync_hash'] = fingerprint(record)
+            records[record['bitrix_id']] = record
+            if record['is_active']:
+                self.seen_ids.add(record['bitrix_id'])
+
+        if not records:
+            return []
+
+        with transaction.atomic():
+            existing = Employee.objects.in_bulk(list(records), field_name='bitrix_id')
+
+            to_update = []
+            to_create = []
+            created = []
+            user_activity = {}
+            activity_changed = False
+            now = timezone.now()
+            for bitrix_id, record in records.items():
+                employee = existing.get(bitrix_id)
+                if employee is None:
+                    # Уволенных в Битриксе заново не заводим
+                    if record['is_active']:
+                        to_create.append(record)
+                    continue
+                if employee.sync_hash == record['sync_hash']:
+                    self.unchanged += 1
+                    continue
+
+                if employee.is_active and not record['is_active']:
+                    self.deactivated += 1
+                else:
+                    self.changed += 1
+                if employee.is_active != record['is_active']:
+                    activity_changed = True
+                    if employee.user_id:
+                        user_activity[employee.user_id] = record['is_active']
+                for field in EMPLOYEE_FIELDS + ['sync_hash']:
+                    setattr(employee, field, record[field])
+                employee.updated_at = now
+                to_update.append(employee)
+
+            if to_update:
+                Employee.objects.bulk_update(
+                    to_update, EMPLOYEE_FIELDS + ['sync_hash', 'updated_at'], batch_size=self.chunk_size
+                )
+            # Уволенные не должны входить в систему, вернувшиеся — снова могут
+            for is_active in (True, False):
+                user_ids = [pk for pk, active in user_activity.items() if active is is_active]
+                if user_ids:
+                    User.objects.filter(pk__in=user_ids).update(is_active=is_active)
+
+            if to_create:
+                created = self._create_employees(to_create)
+            # bulk-операции сигналов не шлют: число активных сотрудников сбрасываем сами
+            if created or activity_changed:
+                invalidate_stats()
+
+        return created
+
+    def _create_employees(self, records: List[Dict]) -> List[Employee]:
+        """Создать сотрудников и связанных Django-пользователей пачками"""
+        users = self._ensure_users(records)
+
+        employees = [
+            Employee(
+                user=users.get(username_for(record['bitrix_id'])),
+                **{field: record[field] for field in ['bitrix_id', 'sync_hash'] + EMPLOYEE_FIELDS},
+            )
+            for record in records
+        ]
+        Employee.objects.bulk_create(employees, batch_size=self.chunk_size)
+        if any(employee.pk is None for employee in employees):
+            # Не все бэкенды возвращают pk из bulk_create, перечитываем одним запросом
+            by_bitrix_id = Employee.objects.in_bulk(
+                [employee.bitrix_id for employee in employees], field_name='bitrix_id'
+            )
+            employees = [by_bitrix_id[employee.bitrix_id] for employee in employees]
+        # Чек-листы новичков создаем сразу, а не при первом открытии страницы
+        materialize_checklists([employee.pk for employee in employees], chunk_size=self.chunk_size)
+        self.created += len(employees)
+        return employees
+
+    def _ensure_users(self, records: List[Dict]) -> Dict[str, User]:
+        """Найти или создать Django-пользователей bitrix_<ID>, вернуть словарь по username"""
+        usernames = [username_for(record['bitrix_id']) for record in records]
+        users = User.objects.in_bulk(usernames, field_name='username')
+
+        new_users = [
+            User(
+                username=username_for(record['bitrix_id']),
+                email=record['email'],
+                first_name=record['first_name'][:150],
+                last_name=record['last_name'][:150],
+                # make_password(None) дает неиспользуемый пароль без хеширования
+                password=make_password(None),
+            )
+            for record in records
+            if username_for(record['bitrix_id']) not in users
+        ]
+        if new_users:
+            User.objects.bulk_create(new_users, batch_size=self.chunk_size)
+            # Не все бэкенды возвращают pk из bulk_create, перечитываем одним запросом
+            users.update(User.objects.in_bulk(
+                [user.username for user in new_users], field_name='username'
+            ))
+        return users
+
+
+def deactivate_missing(seen_ids: Iterable[int], after_id: Optional[int] = None,
+                       started_at: Optional[datetime] = None, bitrix=None,
+                       chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Деактивировать сотрудников, которых нет среди активных в Битриксе.
+
+    Разность множеств считается в памяти за O(n) по одному запросу ID из базы,
+    затем устаревшие строки и их Django-пользователи выключаются UPDATE'ом
+    (пачками, чтобы не упереться в лимит параметров SQLite). Отпечаток
+    сбрасывается, чтобы вернувшийся сотрудник снова прошел как изменившийся.
+
+    after_id — для продолженного прогона: сотрудники с ID не больше курсора
+    закоммичены до сбоя и считаются увиденными, сверяется только остаток.
+    started_at — начало прогона: созданных и измененных позже (например,
+    обработчиком событий) прогон мог не застать, их не трогаем.
+    bitrix — перепроверить кандидатов запросом по ID: выгрузка по смещению
+    пропускает пользователя, если во время прогона кого-то удалили.
+    """
+    seen = set(seen_ids)
+    local_ids = Employee.objects.filter(is_active=True)
+    if after_id is not None:
+        local_ids = local_ids.filter(bitrix_id__gt=after_id)
+    if started_at is not None:
+        local_ids = local_ids.filter(updated_at__lt=started_at)
+    local_ids = local_ids.values_list('bitrix_id', flat=True)
+    stale = sorted(set(local_ids.iterator()) - seen)
+    if bitrix is not None and stale:
+        stale = confirm_missing(bitrix, stale)
+    return deactivate_employees(stale, chunk_size)
+
+
+def confirm_missing(bitrix, bitrix_ids: List[int], chunk_size: int = 50) -> List[int]:
+    """Оставить из ID тех, кого Битрикс не отдает среди активных (запросы по списку ID)"""
+    alive = set()
+    for offset in range(0, len(bitrix_ids), chunk_size):
+        for page in bitrix.iter_user_pages({'ID': bitrix_ids[offset:offset + chunk_size]}):
+            alive.update(int(user['ID']) for user in page if user.get('ACTIVE') is not False)
+    return [bitrix_id for bitrix_id in bitrix_ids if bitrix_id not in alive]
+
+
+def deactivate_employees(bitrix_ids: List[int], chunk_size: int = CHUNK_SIZE) -> int:
+    """Выключить сотрудников с указанными ID Битрикса и их Django-пользователей"""
+    now = timezone.now()
+    deactivated = 0
+    with transaction.atomic():
+        for offset in range(0, len(bitrix_ids), chunk_size):
+            chunk = bitrix_ids[offset:offset + chunk_size]
+            deactivated += Employee.objects.filter(bitrix_id__in=chunk, is_active=True).update(
+                is_active=False, sync_hash='', updated_at=now
+            )
+            User.objects.filter(employee__bitrix_id__in=chunk).update(is_active=False)
+        if deactivated:
+            invalidate_stats()
+    return deactivated
+
+
+def shard_ranges(max_id: int, shards: int) -> List[Tuple[int, int]]:
+    """Разбить диапазон ID 1..max_id на shards непересекающихся отрезков"""
+    shards = max(1, min(shards, max_id))
+    size = -(-max_id // shards)
+    return [(lo, min(lo + size - 1, max_id)) for lo in range(1, max_id + 1, size)]
+
+
+def _fetch_shard(bitrix, filter_params: Dict, id_range: Tuple[int, int],
+                 pages: 'queue.Queue', stop: threading.Event):
+    """Выгрузить один шард в своем потоке: страницы уходят в очередь писателю, в БД поток не ходит"""
+    shard_filter = {**filter_params, '>=ID': id_range[0], '<=ID': id_range[1]}
+    try:
+        for page in bitrix.iter_user_pages(shard_filter):
+            if not _put(pages, (id_range, page, None), stop):
+                return
+        _put(pages, (id_range, None, None), stop)
+    except Exception as e:
+        _put(pages, (id_range, None, e), stop)
+
+
+def _put(pages: 'queue.Queue', item, stop: threading.Event) -> bool:
+    """Положить в ограниченную очередь, пока писатель не попросил остановиться"""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def sync_in_shards(bitrix, filter_params: Dict, workers: int,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Tuple[int, int], EmployeeSync]]:
+    """
+    Синхронизировать сотрудников параллельно, разбив пространство ID Битрикса на шарды.
+
+    Шарды выгружаются из Битрикса в отдельных потоках (ограничитель частоты
+    запросов общий на процесс), а записывает страницы один писатель —
+    вызывающий поток, по транзакции на страницу. SQLite все равно допускает
+    одного писателя, так что транзакции не ждут блокировку друг друга.
+    Очередь ограничена, чтобы выгрузка не убегала далеко вперед записи.
+    Отдает (диапазон ID, синхронизатор) по мере завершения шардов.
+    """
+    max_id = bitrix.get_max_user_id(filter_params or None)
+    if not max_id:
+        return
+
+    ranges = shard_ranges(max_id, workers)
+    syncers = {id_range: EmployeeSync(chunk_size=chunk_size) for id_range in ranges}
+    pages: 'queue.Queue' = queue.Queue(maxsize=len(ranges) * 2)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix='sync-shard') as executor:
+        for id_range in ranges:
+            executor.submit(_fetch_shard, bitrix, filter_params, id_range, pages, stop)
+        try:
+            pending = len(ranges)
+            while pending:
+                id_range, page, error = pages.get()
+                if error is not None:
+                    raise error
+                if page is None:
+                    pending -= 1
+                    yield id_range, syncers[id_range]
+                    continue
+                with transaction.atomic():
+                    syncers[id_range].sync(page)
+        finally:
+            # Ошибка или брошенный генератор: потоки выгрузки завершаются после текущего запроса
+            stop.set()
+
+
+def apply_user_events(bitrix, limit: int = 100) -> Dict[str, int]:
+    """
+    Применить накопленные события Битрикса о пользователях точечно.
+
+    Для добавленных и измененных пользователей берется свежая карточка через
+    get_user и прогоняется через EmployeeSync. Деактивируются удаленные и те,
+    кого Битрикс в успешном ответе не вернул. Если карточку получить не
+    удалось, событие остается в очереди до следующего прохода, а при
+    недоступном портале проход прерывается. Событие удаляется, только если
+    за время обработки по тому же ID не пришло новое.
+    """
+    stats = {'upserted': 0, 'deactivated': 0, 'failed': 0}
+    events = list(UserSyncEvent.objects.order_by('updated_at')[:limit])
+    syncer = EmployeeSync()
+
+    for event in events:
+        bitrix_user = None
+        if event.event != UserSyncEvent.DELETE:
+            try:
+                bitrix_user = bitrix.get_user(event.bitrix_id, use_cache=False)
+            except BitrixUnavailableError as e:
+                logger.warning(f"Bitrix недоступен, события ждут следующего прохода: {e}")
+                stats['failed'] += 1
+                break
+            except BitrixAPIError as e:
+                logger.error(f"Не удалось получить пользователя {event.bitrix_id}: {e}")
+                stats['failed'] += 1
+                continue
+
+        with transaction.atomic():
+            if bitrix_user:
+                syncer.sync([bitrix_user])
+                stats['upserted'] += 1
+            else:
+                stats['deactivated'] += deactivate_employees([event.bitrix_id])
+            UserSyncEvent.objects.filter(pk=event.pk, updated_at=event.updated_at).delete()
+
+    return stats
@@ -1,3 +1,253 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.services.bitrix import RealBitrix24API, get_http_session, reset_bitrix_api
+from core.services.bitrix_standin import BitrixStandIn, mount_standin
+from onboarding.models import EmployeeOnboarding, OnboardingTask
+from users.models import Employee, SyncState, UserSyncEvent
+from users.services.sync import EmployeeSync, apply_user_events, deactivate_missing
+
+
+@override_settings(BITRIX24_MAX_RETRIES=0, BITRIX24_BREAKER_THRESHOLD=1,
+                   BITRIX24_RATE_LIMIT=1000, BITRIX24_RATE_BURST=1000)
+class ApplyUserEventsTests(TestCase):
+    """Точечная синхронизация по событиям: сбой Битрикса не должен выглядеть как удаление"""
+
+    def setUp(self):
+        # Предохранитель общий на процесс: каждому тесту — замкнутый
+        reset_bitrix_api()
+        self.standin = BitrixStandIn(users=20)
+        self.bitrix = RealBitrix24API(mount_standin(get_http_session(), self.standin))
+        self.bitrix_id = self.standin.ids[0]
+        user = User.objects.create_user(username=f'bitrix_{self.bitrix_id}')
+        self.employee = Employee.objects.create(bitrix_id=self.bitrix_id, name='Сотрудник', user=user)
+
+    def test_transient_failure_keeps_employee_and_event(self):
+        self.standin.error_rate = 1
+        other = UserSyncEvent.objects.create(bitrix_id=self.standin.ids[1])
+        UserSyncEvent.objects.filter(pk=other.pk).update(updated_at=other.updated_at.replace(year=2100))
+        UserSyncEvent.objects.create(bitrix_id=self.bitrix_id)
+
+        stats = apply_user_events(self.bitrix)
+
+        self.employee.refresh_from_db()
+        self.employee.user.refresh_from_db()
+        self.assertTrue(self.employee.is_active)
+        self.assertTrue(self.employee.user.is_active)
+        # Первый сбой размыкает предохранитель: проход прерывается, оба события ждут повтора
+        self.assertEqual(stats, {'upserted': 0, 'deactivated': 0, 'failed': 1})
+        self.assertEqual(UserSyncEvent.objects.count(), 2)
+
+    def test_missing_user_is_deactivated(self):
+        UserSyncEvent.objects.create(bitrix_id=self.bitrix_id)
+        self.standin.position_by_id.pop(self.bitrix_id)
+
+        stats = apply_user_events(self.bitrix)
+
+        self.employee.refresh_from_db()
+        self.assertFalse(self.employee.is_active)
+        self.assertEqual(stats['deactivated'], 1)
+        self.assertFalse(UserSyncEvent.objects.exists())
+
+
+@override_settings(BITRIX24_APPLICATION_TOKEN='secret')
+class BitrixEventsViewTests(TestCase):
+    """Приемник исходящих событий Битрикса"""
+
+    def post_json(self, payload):
+        return self.client.post('/api/bitrix/events/', payload, content_type='application/json')
+
+    def test_queues_user_event(self):
+        response = self.post_json({
+            'event': 'ONUSERUPDATE', 'data': {'FIELDS': {'ID': 7}}, 'auth': {'application_token': 'secret'},
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(UserSyncEvent.objects.filter(bitrix_id=7).exists())
+
+    def test_non_ascii_token_is_forbidden(self):
+        response = self.post_json({'event': 'ONUSERUPDATE', 'auth': {'application_token': 'сикрет'}})
+        self.assertEqual(response.status_code, 403)
+
+    def test_malformed_payload_is_rejected(self):
+        self.assertEqual(self.post_json([]).status_code, 400)
+        self.assertEqual(self.post_json({'auth': 'secret'}).status_code, 400)
+        response = self.client.post('/api/bitrix/events/', 'auth=1&auth[application_token]=secret',
+                                    content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(BITRIX24_RATE_LIMIT=1000, BITRIX24_RATE_BURST=1000)
+class DeactivateMissingTests(TestCase):
+    """Сверка после полного прогона: выключаются только действительно пропавшие из Битрикса"""
+
+    def setUp(self):
+        reset_bitrix_api()
+        self.standin = BitrixStandIn(users=30, inactive_share=0)
+        self.bitrix = RealBitrix24API(mount_standin(get_http_session(), self.standin))
+        self.started_at = timezone.now()
+        self.syncer = EmployeeSync()
+        for page in self.bitrix.iter_user_pages():
+            self.syncer.sync(page)
+        Employee.objects.update(updated_at=self.started_at - timedelta(minutes=5))
+
+    def create_stale(self, bitrix_id):
+        user = User.objects.create_user(username=f'bitrix_{bitrix_id}')
+        employee = Employee.objects.create(bitrix_id=bitrix_id, name='Удаленный', user=user)
+        Employee.objects.filter(pk=employee.pk).update(updated_at=self.started_at - timedelta(minutes=5))
+        return employee
+
+    def test_deactivates_employee_missing_in_bitrix(self):
+        employee = self.create_stale(10_000)
+
+        missing = deactivate_missing(self.syncer.seen_ids, started_at=self.started_at, bitrix=self.bitrix)
+
+        employee.refresh_from_db()
+        employee.user.refresh_from_db()
+        self.assertEqual(missing, 1)
+        self.assertFalse(employee.is_active)
+        self.assertFalse(employee.user.is_active)
+        self.assertEqual(Employee.objects.filter(is_active=True).count(), 30)
+
+    def test_keeps_employee_changed_during_run(self):
+        # Создан обработчиком событий после начала прогона: прогон его не видел
+        employee = self.create_stale(10_000)
+        Employee.objects.filter(pk=employee.pk).update(updated_at=self.started_at + timedelta(seconds=1))
+
+        self.assertEqual(deactivate_missing(self.syncer.seen_ids, started_at=self.started_at), 0)
+        employee.refresh_from_db()
+        self.assertTrue(employee.is_active)
+
+    def test_keeps_employee_skipped_by_offset_paging(self):
+        # Удаление во время прогона сдвигает смещения: живой пользователь не попал в seen_ids
+        skipped = self.standin.ids[7]
+        self.syncer.seen_ids.discard(skipped)
+
+        missing = deactivate_missing(self.syncer.seen_ids, started_at=self.started_at, bitrix=self.bitrix)
+
+        self.assertEqual(missing, 0)
+        self.assertTrue(Employee.objects.get(bitrix_id=skipped).is_active)
+
+
+class EmployeeSyncTests(TestCase):
+    """Пакетная синхронизация: счетчики совпадают с тем, что реально записано"""
+
+    def setUp(self):
+        OnboardingTask.objects.create(title='Задача')
+        self.standin = BitrixStandIn(users=30, inactive_share=0.2)
+        self.payloads = [self.standin.user_payload(index) for index in range(len(self.standin.ids))]
+        self.active_ids = {int(payload['ID']) for payload in self.payloads if payload['ACTIVE']}
+
+    def test_first_sync_bulk_creates_active_employees(self):
+        # Пользователь, заведенный раньше вручную, переиспользуется, а не дублируется
+        existing_id = min(self.active_ids)
+        existing = User.objects.create_user(username=f'bitrix_{existing_id}')
+        syncer = EmployeeSync(chunk_size=7)
+
+        created = syncer.sync(self.payloads)
+
+        self.assertEqual(len(created), len(self.active_ids))
+        self.assertEqual(syncer.created, len(self.active_ids))
+        self.assertEqual((syncer.changed, syncer.unchanged, syncer.deactivated), (0, 0, 0))
+        self.assertEqual(set(Employee.objects.values_list('bitrix_id', flat=True)), self.active_ids)
+        self.assertEqual(syncer.seen_ids, self.active_ids)
+        self.assertEqual(User.objects.count(), len(self.active_ids))
+        self.assertEqual(Employee.objects.get(bitrix_id=existing_id).user, existing)
+        self.assertFalse(Employee.objects.filter(user=None).exists())
+        self.assertEqual(EmployeeOnboarding.objects.count(), len(self.active_ids))
+
+    def test_resync_skips_unchanged_and_counts_changes(self):
+        EmployeeSync().sync(self.payloads)
+        first, second = sorted(self.active_ids)[:2]
+        for payload in self.payloads:
+            if int(payload['ID']) == first:
+                payload['WORK_POSITION'] = 'Тимлид'
+            elif int(payload['ID']) == second:
+                payload['ACTIVE'] = False
+        syncer = EmployeeSync()
+
+        self.assertEqual(syncer.sync(self.payloads), [])
+
+        self.assertEqual(syncer.created, 0)
+        self.assertEqual(syncer.changed, 1)
+        self.assertEqual(syncer.deactivated, 1)
+        self.assertEqual(syncer.unchanged, len(self.active_ids) - 2)
+        self.assertEqual(Employee.objects.get(bitrix_id=first).position, 'Тимлид')
+        self.assertFalse(User.objects.get(username=f'bitrix_{second}').is_active)
+
+        # Повтор без изменений ничего не пишет
+        repeat = EmployeeSync()
+        with CaptureQueriesContext(connection) as queries:
+            repeat.sync(self.payloads)
+        self.assertEqual(repeat.unchanged, len(self.active_ids))
+        self.assertFalse([query for query in queries if query['sql'].startswith(('INSERT', 'UPDATE'))])
+
+
+@override_settings(BITRIX24_RATE_LIMIT=1000, BITRIX24_RATE_BURST=1000)
+class ResumeSyncTests(TestCase):
+    """sync_users --resume: прерванный полный прогон продолжается с курсора"""
+
+    def setUp(self):
+        reset_bitrix_api()
+        self.standin = BitrixStandIn(users=30, inactive_share=0)
+        self.webhook = mount_standin(get_http_session(), self.standin)
+        self.cursor = self.standin.ids[14]
+        run_started_at = timezone.now() - timedelta(minutes=1)
+
+        # Прерванный прогон успел закоммитить страницы до курсора
+        EmployeeSync().sync([
+            self.standin.user_payload(index) for index, bitrix_id in enumerate(self.standin.ids)
+            if bitrix_id <= self.cursor
+        ])
+        user = User.objects.create_user(username='bitrix_10000')
+        self.deleted = Employee.objects.create(bitrix_id=10_000, name='Удаленный', user=user)
+        Employee.objects.update(updated_at=run_started_at - timedelta(minutes=5))
+        self.state = SyncState.objects.create(
+            name='bitrix_users', cursor=self.cursor, run_kind=SyncState.FULL, run_started_at=run_started_at,
+        )
+        # Уволен в Битриксе среди уже пройденных ID
+        self.fired = self.standin.ids[3]
+        self.standin.active[3] = False
+
+    def sync(self, **options):
+        out = StringIO()
+        call_command('sync_users', real=True, webhook=self.webhook, stdout=out, **options)
+        return out.getvalue()
+
+    def test_resume_continues_after_cursor(self):
+        run_started_at = self.state.run_started_at
+
+        output = self.sync(resume=True)
+
+        self.assertIn('создано 15, изменено 0, без изменений 0, деактивировано 1', output)
+        self.assertEqual(Employee.objects.filter(is_active=True, bitrix_id__in=self.standin.ids).count(), 30)
+        self.deleted.refresh_from_db()
+        self.assertFalse(self.deleted.is_active)
+        # Сверка ограничена ID после курсора: пройденные до сбоя страницы не перечитываются
+        self.assertTrue(Employee.objects.get(bitrix_id=self.fired).is_active)
+        self.state.refresh_from_db()
+        self.assertIsNone(self.state.cursor)
+        self.assertEqual(self.state.run_kind, '')
+        self.assertEqual(self.state.last_synced_at, run_started_at)
+
+    def test_without_resume_restarts_from_scratch(self):
+        output = self.sync()
+
+        self.assertIn('создано 15, изменено 0, без изменений 14, деактивировано 2', output)
+        self.assertFalse(Employee.objects.get(bitrix_id=self.fired).is_active)
+        self.deleted.refresh_from_db()
+        self.assertFalse(self.deleted.is_active)
+
+    def test_after_id_limits_sweep(self):
+        missing = deactivate_missing(set(), after_id=self.cursor, started_at=self.state.run_started_at)
+
+        self.assertEqual(missing, 1)
+        self.deleted.refresh_from_db()
+        self.assertFalse(self.deleted.is_active)
+        self.assertEqual(Employee.objects.filter(is_active=True).count(), 15)
@@ -1,6 +1,24 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Employee
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from core.services.bitrix_params import unflatten_params
+from .models import Employee, UserSyncEvent
+import hmac
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Исходящие события Битрикс24 о пользователях
+BITRIX_USER_EVENTS = {
+    'ONUSERADD': UserSyncEvent.UPSERT,
+    'ONUSERUPDATE': UserSyncEvent.UPSERT,
+    'ONUSERDELETE': UserSyncEvent.DELETE,
+}
+
 
 @login_required
 def employee_list(request):
@@ -10,10 +28,66 @@ def employee_list(request):
         'employees': employees
     })
 
+
 @login_required
 def employee_detail(request, pk):
     """Детальная страница сотрудника"""
     employee = get_object_or_404(Employee, pk=pk)
     return render(request, 'employees/detail.html', {
         'employee': employee
-    })
\ No newline at end of file
+    })
+
+
+def _event_user_ids(data) -> list:
+    """Достать ID пользователей из data события (data[FIELDS][ID], data[ID] или список)"""
+    if isinstance(data, dict):
+        fields = data.get('FIELDS') if isinstance(data.get('FIELDS'), dict) else data
+        value = fields.get('ID')
+    else:
+        value = data
+    if isinstance(value, (list, tuple)):
+        return [int(item) for item in value]
+    return [int(value)] if value not in (None, '') else []
+
+
+@csrf_exempt
+@require_POST
+def bitrix_events(request):
+    """Приемник исходящих событий Битрикс24: ставит ID пользователей в очередь точечной синхронизации"""
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    else:
+        # Битрикс шлет form-urlencoded: event=ONUSERADD&data[FIELDS][ID]=5&auth[application_token]=...
+        try:
+            payload = unflatten_params(request.POST.items())
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid parameters'}, status=400)
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('auth') or {}, dict):
+        return JsonResponse({'success': False, 'error': 'Invalid payload'}, status=400)
+    auth = payload.get('auth') or {}
+
+    expected = settings.BITRIX24_APPLICATION_TOKEN
+    token = str(auth.get('application_token', ''))
+    # Сравниваем байты: compare_digest не принимает строки с не-ASCII символами
+    if not expected or not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+        logger.warning("Bitrix event with invalid application_token")
+        return JsonResponse({'success': False, 'error': 'Forbidden'}, status=403)
+
+    event = str(payload.get('event', '')).upper()
+    kind = BITRIX_USER_EVENTS.get(event)
+    if kind is None:
+        return JsonResponse({'success': True, 'ignored': event})
+
+    try:
+        user_ids = _event_user_ids(payload.get('data'))
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Invalid user ID'}, status=400)
+
+    for bitrix_id in user_ids:
+        UserSyncEvent.objects.update_or_create(bitrix_id=bitrix_id, defaults={'event': kind})
+
+    return JsonResponse({'success': True, 'queued': len(user_ids)})
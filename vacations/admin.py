@@ -1,13 +1,36 @@
 from django.contrib import admin
-from .models import VacationBalance, VacationRequest
+from .models import ProductionCalendarDay, VacationBalance, VacationBalanceEntry, VacationRequest
 
 @admin.register(VacationBalance)
 class VacationBalanceAdmin(admin.ModelAdmin):
     list_display = ['employee', 'year', 'total_days', 'used_days', 'remaining_days']
     list_filter = ['year']
 
+@admin.register(VacationBalanceEntry)
+class VacationBalanceEntryAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'year', 'days', 'reason', 'vacation', 'created_at']
+    list_filter = ['reason', 'year']
+    list_select_related = ['employee', 'vacation']
+
+    # Журнал только пополняется и только переходами заявок
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(VacationRequest)
 class VacationRequestAdmin(admin.ModelAdmin):
     list_display = ['employee', 'start_date', 'end_date', 'status', 'days_count']
     list_filter = ['status', 'start_date']
-    search_fields = ['employee__name']
\ No newline at end of file
+    search_fields = ['employee__name']
+
+
+@admin.register(ProductionCalendarDay)
+class ProductionCalendarDayAdmin(admin.ModelAdmin):
+    list_display = ['date', 'kind']
+    list_filter = ['kind']
+    date_hierarchy = 'date'
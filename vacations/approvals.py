@@ -0,0 +1,118 @@
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import BitrixOutbox
+from core.services.outbox import enqueue_many, outbox_entry
+from onboarding.stats import invalidate_stats
+from users.models import Employee
+from .availability import capacity_check
+from .balances import approve_entries, post_entries
+from .models import VacationRequest
+
+# ============================================
+# Решения по заявкам: утверждение и отклонение пачкой
+# ============================================
+
+APPROVED = 'approved'
+REJECTED = 'rejected'
+# Результаты по отдельным ID
+NOT_PENDING = 'not_pending'
+NOT_FOUND = 'not_found'
+OVER_CAPACITY = 'over_capacity'
+
+
+def approved_outbox_entries(vacation: VacationRequest) -> List[BitrixOutbox]:
+    """Событие календаря и уведомление об утвержденном отпуске"""
+    key = f'vacation-{vacation.pk}-approved-{vacation.approved_at:%Y%m%d%H%M%S%f}'
+    bitrix_user_id = vacation.employee.bitrix_id
+    return [
+        outbox_entry('calendar_event', bitrix_user_id, {
+            'name': 'Отпуск',
+            'description': vacation.comment,
+            'from': vacation.start_date.isoformat(),
+            'to': vacation.end_date.isoformat(),
+        }, f'{key}-calendar'),
+        outbox_entry('notification', bitrix_user_id, {
+            'message': f'Ваш отпуск с {vacation.start_date:%d.%m.%Y} по {vacation.end_date:%d.%m.%Y} утвержден',
+        }, f'{key}-notify'),
+    ]
+
+
+def rejected_outbox_entries(vacation: VacationRequest) -> List[BitrixOutbox]:
+    """Уведомление об отклоненной заявке"""
+    return [
+        outbox_entry('notification', vacation.employee.bitrix_id, {
+            'message': f'Заявка на отпуск с {vacation.start_date:%d.%m.%Y} по {vacation.end_date:%d.%m.%Y} отклонена',
+        }, f'vacation-{vacation.pk}-rejected-{vacation.updated_at:%Y%m%d%H%M%S%f}'),
+    ]
+
+
+def decide_vacations(ids: Iterable[int], status: str, decided_by: Optional[Employee] = None,
+                     force: bool = False) -> Dict[int, str]:
+    """
+    Утвердить или отклонить заявки пачкой в одной транзакции.
+
+    Меняются только строки, которые все еще на согласовании: они читаются
+    с блокировкой и обновляются одним условным UPDATE, поэтому параллельное
+    решение другого HR не перезаписывается; журнал и outbox строятся только
+    по строкам, которые этот UPDATE действительно изменил. При утверждении
+    без force заявки по порядку ID проверяются на лимит одновременно
+    отсутствующих (с учетом утвержденных ранее в этой же пачке), превышающие
+    остаются на согласовании.
+    Утвержденным проставляются approved_by / approved_at, а дни списываются
+    с балансов через журнал (одним агрегированным UPDATE). Вызовы Битрикса
+    ставятся в outbox одним INSERT. Возвращает результат по каждому ID.
+    """
+    if status not in (APPROVED, REJECTED):
+        raise ValueError(f'Недопустимый статус: {status}')
+
+    ids = list(dict.fromkeys(int(pk) for pk in ids))
+    now = timezone.now()
+    with transaction.atomic():
+        existing = VacationRequest.objects.select_for_update().filter(pk__in=ids)
+        found = dict(existing.values_list('pk', 'status'))
+        pending = list(
+            existing.filter(status='pending').select_related('employee')
+            .only('employee__bitrix_id', 'employee__department', 'start_date', 'end_date', 'comment')
+        )
+        over_capacity = set()
+        if status == APPROVED and not force:
+            order = {pk: index for index, pk in enumerate(ids)}
+            pending.sort(key=lambda vacation: order[vacation.pk])
+            over_capacity = {pk for pk, days in capacity_check(pending).items() if days}
+            pending = [vacation for vacation in pending if vacation.pk not in over_capacity]
+
+        changes = {'status': status, 'updated_at': now}
+        if status == APPROVED:
+            changes.update(approved_by=decided_by, approved_at=now)
+        pending_ids = [vacation.pk for vacation in pending]
+        updated = VacationRequest.objects.filter(pk__in=pending_ids, status='pending').update(**changes)
+        if updated != len(pending):
+            # Часть строк успел решить параллельный запрос (на SQLite select_for_update
+            # не блокирует): журнал и outbox — только для измененных этим UPDATE
+            mine = set(
+                VacationRequest.objects.filter(pk__in=pending_ids, **changes).values_list('pk', flat=True)
+            )
+            pending = [vacation for vacation in pending if vacation.pk in mine]
+
+        entries = []
+        for vacation in pending:
+            for field, value in changes.items():
+                setattr(vacation, field, value)
+            entries += approved_outbox_entries(vacation) if status == APPROVED else rejected_outbox_entries(vacation)
+        if status == APPROVED:
+            post_entries(approve_entries(pending))
+        # Битрикс вызывается воркером outbox_worker, а не внутри HTTP-запроса
+        enqueue_many(entries)
+        if pending:
+            invalidate_stats()
+
+    decided = {vacation.pk for vacation in pending}
+    return {
+        pk: status if pk in decided else (
+            OVER_CAPACITY if pk in over_capacity else NOT_PENDING if pk in found else NOT_FOUND
+        )
+        for pk in ids
+    }
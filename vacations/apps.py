@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class VacationsConfig(AppConfig):
     name = 'vacations'
+
+    def ready(self):
+        # Балансы следуют за переходами заявок в статус approved и из него
+        from . import signals  # noqa: F401
@@ -0,0 +1,154 @@
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import QuerySet
+
+from users.models import Employee
+from .calendar import MAX_VACATION_DAYS
+from .models import VacationRequest
+
+# ============================================
+# Доступность команды: сколько коллег отсутствует в каждый день периода
+# ============================================
+
+# Какие заявки занимают дни: утвержденные и ожидающие согласования
+ABSENCE_STATUSES = ('approved', 'pending')
+
+
+def absence_intervals(department: int, start: date, end: date,
+                      statuses: Iterable[str] = ABSENCE_STATUSES,
+                      exclude_employee: Optional[int] = None) -> QuerySet:
+    """Интервалы отпусков активных сотрудников подразделения, пересекающиеся с [start, end], — один запрос"""
+    intervals = VacationRequest.objects.filter(
+        employee__department=department,
+        employee__is_active=True,
+        status__in=list(statuses),
+        start_date__gte=start - timedelta(days=MAX_VACATION_DAYS),
+        start_date__lte=end,
+        end_date__gte=start,
+    )
+    if exclude_employee is not None:
+        intervals = intervals.exclude(employee_id=exclude_employee)
+    return intervals.order_by('employee_id', 'start_date').values_list('employee_id', 'start_date', 'end_date')
+
+
+def daily_absence(intervals: Iterable[Tuple[int, date, date]], start: date, end: date) -> List[int]:
+    """
+    Число отсутствующих сотрудников по дням [start, end] разностным массивом.
+
+    Интервалы должны идти по сотрудникам и дате начала; пересекающиеся заявки
+    одного сотрудника склеиваются, чтобы он не считался дважды.
+    Сложность O(интервалов + дней).
+    """
+    days = (end - start).days + 1
+    diff = [0] * (days + 1)
+    for _, employee_intervals in groupby(intervals, key=lambda row: row[0]):
+        current_start = current_end = None
+        for _, interval_start, interval_end in employee_intervals:
+            if current_end is not None and interval_start <= current_end + timedelta(days=1):
+                current_end = max(current_end, interval_end)
+                continue
+            if current_end is not None:
+                _mark(diff, start, end, current_start, current_end)
+            current_start, current_end = interval_start, interval_end
+        if current_end is not None:
+            _mark(diff, start, end, current_start, current_end)
+
+    counts = []
+    running = 0
+    for delta in diff[:days]:
+        running += delta
+        counts.append(running)
+    return counts
+
+
+def _mark(diff: List[int], start: date, end: date, interval_start: date, interval_end: date):
+    lo = (max(interval_start, start) - start).days
+    hi = (min(interval_end, end) - start).days
+    if lo <= hi:
+        diff[lo] += 1
+        diff[hi + 1] -= 1
+
+
+def team_size(department: int) -> int:
+    return Employee.objects.filter(department=department, is_active=True).count()
+
+
+def max_absent(size: int) -> int:
+    """Сколько человек команды может отсутствовать одновременно (хотя бы один)"""
+    return max(1, int(size * settings.VACATION_MAX_ABSENT_SHARE))
+
+
+def department_availability(department: int, start: date, end: date,
+                            statuses: Iterable[str] = ABSENCE_STATUSES,
+                            exclude_employee: Optional[int] = None) -> Dict:
+    """Сводка по подразделению за период: отсутствующие по дням, пик и лимит команды"""
+    counts = daily_absence(absence_intervals(department, start, end, statuses, exclude_employee), start, end)
+    peak = max(counts, default=0)
+    size = team_size(department)
+    return {
+        'department': department,
+        'start': start,
+        'end': end,
+        'team_size': size,
+        'max_absent': max_absent(size),
+        'days': counts,
+        'peak': peak,
+        'peak_date': start + timedelta(days=counts.index(peak)) if peak else None,
+    }
+
+
+def colleagues_off(vacation: VacationRequest, statuses: Iterable[str] = ABSENCE_STATUSES) -> Optional[Dict]:
+    """Доступность коллег сотрудника на даты заявки (без него самого); None, если подразделение неизвестно"""
+    department = vacation.employee.department
+    if department is None:
+        return None
+    return department_availability(
+        department, vacation.start_date, vacation.end_date, statuses, exclude_employee=vacation.employee_id
+    )
+
+
+def capacity_violations(vacation: VacationRequest) -> List[date]:
+    """
+    Дни, в которые утверждение заявки превысит лимит одновременно отсутствующих.
+
+    Учитываются только уже утвержденные отпуска коллег плюс сама заявка.
+    """
+    return capacity_check([vacation])[vacation.pk]
+
+
+def capacity_check(vacations: Iterable[VacationRequest]) -> Dict[int, List[date]]:
+    """
+    Дни превышения лимита для каждой из утверждаемых заявок.
+
+    Заявки проверяются по порядку: прошедшая проверку считается утвержденной
+    и учитывается для следующих, поэтому пересекающиеся заявки одной пачки
+    не пройдут вместе сверх лимита. Утвержденные отпуска коллег читаются
+    одним запросом на подразделение. Без подразделения лимита нет.
+    """
+    violations = {}
+    by_department: Dict[int, List[VacationRequest]] = {}
+    for vacation in vacations:
+        violations[vacation.pk] = []
+        if vacation.employee.department is not None:
+            by_department.setdefault(vacation.employee.department, []).append(vacation)
+
+    for department, group in by_department.items():
+        start = min(vacation.start_date for vacation in group)
+        end = max(vacation.end_date for vacation in group)
+        intervals = list(absence_intervals(department, start, end, statuses=('approved',)))
+        limit = max_absent(team_size(department))
+        for vacation in group:
+            colleagues = sorted(row for row in intervals if row[0] != vacation.employee_id)
+            counts = daily_absence(colleagues, vacation.start_date, vacation.end_date)
+            days = [
+                vacation.start_date + timedelta(days=offset)
+                for offset, count in enumerate(counts)
+                if count + 1 > limit
+            ]
+            violations[vacation.pk] = days
+            if not days:
+                intervals.append((vacation.employee_id, vacation.start_date, vacation.end_date))
+    return violations
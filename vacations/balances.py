@@ -0,0 +1,177 @@
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Sum, Value, When
+from django.utils import timezone
+
+from users.models import Employee
+from .models import VacationBalance, VacationBalanceEntry
+from .workdays import vacation_days_many
+
+# ============================================
+# Балансы отпусков: журнал изменений и агрегированные изменения used_days
+# ============================================
+# Каждый переход заявки в статус approved и из него оставляет записи
+# в VacationBalanceEntry, а used_days сдвигается на их сумму, поэтому
+# баланс всегда читается одной строкой и сверяется с журналом.
+
+# Сколько пар (сотрудник, год) обновлять одним UPDATE
+CHUNK_SIZE = 200
+
+
+def vacation_days_by_year(start_date: date, end_date: date) -> Dict[int, int]:
+    """
+    Дни отпуска по производственному календарю с разбивкой по годам
+    (отпуск может переходить через Новый год).
+    """
+    starts, ends = [], []
+    current = start_date
+    while current <= end_date:
+        year_end = min(end_date, date(current.year, 12, 31))
+        starts.append(current)
+        ends.append(year_end)
+        current = year_end + timedelta(days=1)
+    return {
+        start.year: int(days)
+        for start, days in zip(starts, vacation_days_many(starts, ends))
+    }
+
+
+def approve_entries(vacations: Iterable) -> List[VacationBalanceEntry]:
+    """Записи журнала о списании дней: по одной на каждый год отпуска"""
+    return [
+        VacationBalanceEntry(
+            employee_id=vacation.employee_id, year=year, days=days,
+            reason=VacationBalanceEntry.APPROVE, vacation_id=vacation.pk,
+        )
+        for vacation in vacations
+        for year, days in vacation_days_by_year(vacation.start_date, vacation.end_date).items()
+        if days
+    ]
+
+
+def revoke_entries(vacation_ids: Iterable[int]) -> List[VacationBalanceEntry]:
+    """
+    Записи журнала о возврате дней: ровно то, что по заявкам списано сейчас.
+
+    Суммы берутся из самого журнала, поэтому возврат точен, даже если
+    правила подсчета дней поменялись после утверждения.
+    """
+    posted = (
+        VacationBalanceEntry.objects
+        .filter(vacation_id__in=list(vacation_ids))
+        .values('vacation_id', 'employee_id', 'year')
+        .annotate(total=Sum('days'))
+        .order_by()
+    )
+    return [
+        VacationBalanceEntry(
+            employee_id=row['employee_id'], year=row['year'], days=-row['total'],
+            reason=VacationBalanceEntry.REVOKE, vacation_id=row['vacation_id'],
+        )
+        for row in posted
+        if row['total']
+    ]
+
+
+def post_entries(entries: List[VacationBalanceEntry]) -> int:
+    """
+    Провести записи журнала: сохранить их одним INSERT и сдвинуть балансы
+    одним агрегированным UPDATE на пару (сотрудник, год).
+    Вызывать внутри транзакции изменения статусов.
+    """
+    if not entries:
+        return 0
+    VacationBalanceEntry.objects.bulk_create(entries, batch_size=500)
+    deltas = Counter()
+    for entry in entries:
+        deltas[(entry.employee_id, entry.year)] += entry.days
+    return apply_balance_deltas(deltas)
+
+
+def get_balance(employee_id: int, year: int) -> Optional[VacationBalance]:
+    """Баланс сотрудника за год — одно чтение по уникальному индексу (employee, year)"""
+    return VacationBalance.objects.filter(employee_id=employee_id, year=year).first()
+
+
+def apply_balance_deltas(deltas: Dict[Tuple[int, int], float], chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Применить изменения used_days: по одному слагаемому на пару (сотрудник, год).
+
+    Недостающие балансы создаются одним bulk_create, затем каждая пачка пар
+    обновляется одним UPDATE с CASE — сколько бы заявок ни пришлось на пару.
+    Вызывать внутри транзакции изменения статусов.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+
+    VacationBalance.objects.bulk_create(
+        [VacationBalance(employee_id=employee_id, year=year) for employee_id, year in deltas],
+        batch_size=500, ignore_conflicts=True,
+    )
+
+    items = list(deltas.items())
+    now = timezone.now()
+    updated = 0
+    for offset in range(0, len(items), chunk_size):
+        chunk = items[offset:offset + chunk_size]
+        matches = Q()
+        whens = []
+        for (employee_id, year), delta in chunk:
+            pair = Q(employee_id=employee_id, year=year)
+            matches |= pair
+            whens.append(When(pair, then=Value(float(delta))))
+        updated += VacationBalance.objects.filter(matches).update(
+            used_days=F('used_days') + Case(*whens, default=Value(0.0), output_field=FloatField()),
+            updated_at=now,
+        )
+    return updated
+
+
+def rollover_balances(year: int, total_days: Optional[float] = None, carry_over: bool = False,
+                      chunk_size: int = 500) -> int:
+    """
+    Завести балансы на год для всех активных сотрудников пачками bulk_create.
+
+    Сотрудники идут по возрастанию pk кусками по chunk_size, каждый кусок —
+    своя транзакция; уже существующие балансы не трогаются (ignore_conflicts),
+    поэтому прерванный прогон можно просто повторить. С carry_over к норме
+    добавляется неиспользованный остаток прошлого года.
+    Возвращает число сотрудников, для которых отправлены балансы.
+    """
+    if total_days is None:
+        total_days = VacationBalance._meta.get_field('total_days').default
+
+    processed = 0
+    last_pk = 0
+    while True:
+        employee_ids = list(
+            Employee.objects.filter(is_active=True, pk__gt=last_pk)
+            .order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not employee_ids:
+            break
+        last_pk = employee_ids[-1]
+
+        carried = {}
+        if carry_over:
+            carried = {
+                employee_id: max(0.0, total - used)
+                for employee_id, total, used in VacationBalance.objects
+                .filter(year=year - 1, employee_id__in=employee_ids)
+                .values_list('employee_id', 'total_days', 'used_days')
+            }
+        with transaction.atomic():
+            VacationBalance.objects.bulk_create(
+                [
+                    VacationBalance(employee_id=employee_id, year=year,
+                                    total_days=total_days + carried.get(employee_id, 0))
+                    for employee_id in employee_ids
+                ],
+                batch_size=chunk_size, ignore_conflicts=True,
+            )
+        processed += len(employee_ids)
+    return processed
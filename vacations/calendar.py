@@ -0,0 +1,102 @@
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.db.models import Count, Max, QuerySet
+
+from .models import VacationRequest
+
+# ============================================
+# Лента отпусков для FullCalendar
+# ============================================
+
+# Окно по умолчанию (если календарь не прислал start/end) и предел размера окна
+DEFAULT_WINDOW_DAYS = 42
+MAX_WINDOW_DAYS = 400
+# Самый длинный отпуск (по уходу за ребенком — до трех лет): нижняя граница
+# по start_date делает просмотр индекса конечным при любой глубине истории
+MAX_VACATION_DAYS = 3 * 366
+
+
+def parse_calendar_date(value: Optional[str]) -> Optional[date]:
+    """Дата из параметров FullCalendar: '2024-02-01' или '2024-02-01T00:00:00+03:00'"""
+    if not value:
+        return None
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def calendar_window(start: Optional[str], end: Optional[str], today: Optional[date] = None) -> Tuple[date, date]:
+    """
+    Окно [start, end) из запроса календаря.
+
+    Без параметров берется текущий месяц с запасом на сетку из шести
+    недель; слишком широкое окно обрезается. Неверная дата — ValueError.
+    """
+    window_start = parse_calendar_date(start)
+    window_end = parse_calendar_date(end)
+    if window_start is None:
+        window_start = (window_end or today or date.today()).replace(day=1)
+    if window_end is None or window_end <= window_start:
+        window_end = window_start + timedelta(days=DEFAULT_WINDOW_DAYS)
+    window_end = min(window_end, window_start + timedelta(days=MAX_WINDOW_DAYS))
+    return window_start, window_end
+
+
+def approved_in_window(window_start: date, window_end: date) -> QuerySet:
+    """
+    Утвержденные отпуска, пересекающиеся с окном [window_start, window_end).
+
+    Условие пересечения идет по индексу (status, start_date, end_date),
+    а start_date ограничен снизу длиной самого долгого отпуска, поэтому
+    стоимость не зависит от глубины истории.
+    """
+    return VacationRequest.objects.filter(
+        status='approved',
+        start_date__gte=window_start - timedelta(days=MAX_VACATION_DAYS),
+        start_date__lt=window_end,
+        end_date__gte=window_start,
+    )
+
+
+def window_state(window_start: date, window_end: date) -> Dict:
+    """
+    Версия окна для условного GET: число утвержденных отпусков и
+    последнее изменение среди них.
+
+    Появление, удаление или смена статуса меняют число, правка — отметку
+    времени, поэтому ETag из этой пары меняется при любом изменении ленты.
+    """
+    state = approved_in_window(window_start, window_end).aggregate(
+        count=Count('pk'), last_modified=Max('updated_at')
+    )
+    payload = f"{window_start}:{window_end}:{state['count']}:{state['last_modified']}"
+    state['etag'] = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    return state
+
+
+def calendar_event(vacation: VacationRequest) -> Dict:
+    """Событие FullCalendar для утвержденного отпуска"""
+    return {
+        'title': f'Отпуск: {vacation.employee.name}',
+        'start': vacation.start_date.isoformat(),
+        'end': (vacation.end_date + timedelta(days=1)).isoformat(),  # +1 день для FullCalendar
+        'color': '#2fc6f6',
+        'textColor': 'white',
+        'url': f'/vacations/{vacation.id}/',
+        'description': vacation.comment,
+    }
+
+
+def iter_events_json(window_start: date, window_end: date, chunk_size: int = 500) -> Iterator[str]:
+    """JSON-массив событий по кускам: строки читаются курсором и сразу уходят клиенту"""
+    vacations = (
+        approved_in_window(window_start, window_end)
+        .select_related('employee')
+        .only('start_date', 'end_date', 'comment', 'employee__name')
+        .order_by('start_date', 'pk')
+    )
+    yield '['
+    for index, vacation in enumerate(vacations.iterator(chunk_size=chunk_size)):
+        yield (',' if index else '') + json.dumps(calendar_event(vacation), ensure_ascii=False)
+    yield ']'
@@ -0,0 +1,164 @@
+import hashlib
+import secrets
+from datetime import date, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Count, Max, Q, QuerySet
+from django.utils import timezone
+
+from users.models import Employee
+from .models import VacationRequest
+
+# ============================================
+# Лента утвержденных отпусков в формате iCalendar (RFC 5545)
+# ============================================
+
+# Насколько глубоко в прошлое смотрит лента (календарям давняя история не нужна)
+FEED_HISTORY_DAYS = 365
+FEED_SALT = 'vacations.ics'
+PRODID = '-//TechTalentHub//Vacations//RU'
+
+
+def feed_token(employee: Employee, scope: str, object_id: int) -> str:
+    """
+    Личный токен подписки календаря без входа в систему: кто подписан,
+    на какую ленту и с каким ключом (смена ключа отзывает все его ссылки).
+    """
+    payload = {'scope': scope, 'id': object_id, 'user': employee.pk, 'key': employee.feed_key}
+    return signing.dumps(payload, salt=FEED_SALT)
+
+
+def can_read_feed(employee: Employee, scope: str, object_id: int) -> bool:
+    """Лента своя: собственные отпуска или отпуска своего подразделения"""
+    if scope == 'employee':
+        return employee.pk == object_id
+    return employee.department is not None and employee.department == object_id
+
+
+def feed_subscriber(token: Optional[str], scope: str, object_id: int) -> Optional[Employee]:
+    """
+    Владелец действующего токена или None.
+
+    Кроме подписи при каждом запросе проверяется, что сотрудник и его вход
+    активны, ключ не сменился, а лента по-прежнему его (не перевели в другое
+    подразделение).
+    """
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=FEED_SALT, max_age=settings.VACATION_FEED_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or (payload.get('scope'), payload.get('id')) != (scope, object_id):
+        return None
+
+    employee = Employee.objects.select_related('user').filter(pk=payload.get('user'), is_active=True).first()
+    if employee is None or payload.get('key') != employee.feed_key:
+        return None
+    if employee.user is not None and not employee.user.is_active:
+        return None
+    return employee if can_read_feed(employee, scope, object_id) else None
+
+
+def rotate_feed_key(employee: Employee):
+    """Выдать новый ключ: все прежние ссылки сотрудника перестают работать"""
+    employee.feed_key = secrets.token_hex(16)
+    employee.save(update_fields=['feed_key', 'updated_at'])
+
+
+def feed_queryset(scope: str, object_id: int, today: Optional[date] = None) -> QuerySet:
+    """Заявки ленты (любых статусов) за последний год и вперед: подразделение или сотрудник"""
+    cutoff = (today or timezone.localdate()) - timedelta(days=FEED_HISTORY_DAYS)
+    vacations = VacationRequest.objects.filter(end_date__gte=cutoff)
+    if scope == 'department':
+        return vacations.filter(employee__department=object_id, employee__is_active=True)
+    return vacations.filter(employee_id=object_id)
+
+
+def feed_state(vacations: QuerySet) -> Dict:
+    """
+    Версия ленты одним агрегатом: последнее изменение среди заявок области
+    (смена статуса тоже его двигает) и число утвержденных (ловит удаления).
+    В ETag они попадают только хешем.
+    """
+    state = vacations.aggregate(
+        last_modified=Max('updated_at'),
+        approved=Count('pk', filter=Q(status='approved')),
+    )
+    payload = f"{state['approved']}-{state['last_modified'].timestamp() if state['last_modified'] else 0}"
+    state['etag'] = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    return state
+
+
+def escape_text(value: str) -> str:
+    """Экранирование TEXT-значений iCalendar"""
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold(line: str) -> str:
+    """Перенос строк длиннее 75 октетов, не разрывая многобайтные символы"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    current = ''
+    size = 0
+    limit = 75
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            parts.append(current)
+            current = ''
+            size = 0
+            # Продолжение начинается с пробела, он тоже занимает октет
+            limit = 74
+        current += char
+        size += char_size
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def vacation_event(vacation: VacationRequest, host: str) -> str:
+    """VEVENT на весь день для утвержденного отпуска"""
+    stamp = vacation.updated_at.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:vacation-{vacation.pk}@{host}',
+        f'DTSTAMP:{stamp}',
+        f'LAST-MODIFIED:{stamp}',
+        f'DTSTART;VALUE=DATE:{vacation.start_date:%Y%m%d}',
+        # DTEND не входит в событие: день после окончания
+        f'DTEND;VALUE=DATE:{vacation.end_date + timedelta(days=1):%Y%m%d}',
+        f'SUMMARY:{escape_text("Отпуск: " + vacation.employee.name)}',
+        'TRANSP:TRANSPARENT',
+    ]
+    if vacation.comment:
+        lines.append(f'DESCRIPTION:{escape_text(vacation.comment)}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def iter_calendar(vacations: QuerySet, name: str, host: str, chunk_size: int = 500) -> Iterator[str]:
+    """Календарь по кускам: заявки читаются курсором, память не зависит от размера ленты"""
+    yield ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+    ])
+    approved = (
+        vacations.filter(status='approved')
+        .select_related('employee')
+        .only('start_date', 'end_date', 'comment', 'updated_at', 'employee__name')
+        .order_by('start_date', 'pk')
+    )
+    for vacation in approved.iterator(chunk_size=chunk_size):
+        yield vacation_event(vacation, host)
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,45 @@
+import xml.etree.ElementTree as ET
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from vacations.models import ProductionCalendarDay
+from vacations.workdays import clear_cache
+
+# Типы дней в XML производственного календаря (формат xmlcalendar):
+# 1 — выходной, 2 — сокращенный рабочий, 3 — рабочий (перенос)
+XML_DAY_OFF = '1'
+XML_WORKDAY = '3'
+
+
+class Command(BaseCommand):
+    help = 'Загрузить производственный календарь года из XML (формат xmlcalendar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Путь к XML-файлу календаря')
+
+    def handle(self, *args, **options):
+        try:
+            root = ET.parse(options['path']).getroot()
+            year = int(root.get('year'))
+        except (OSError, ET.ParseError, TypeError, ValueError) as e:
+            raise CommandError(f'Не удалось прочитать календарь: {e}')
+
+        days = []
+        for day in root.iter('day'):
+            day_month, day_number = (int(part) for part in day.get('d').split('.'))
+            kind = day.get('t')
+            if kind == XML_DAY_OFF:
+                # Праздник помечен атрибутом h, иначе это перенесенный выходной
+                kind = ProductionCalendarDay.HOLIDAY if day.get('h') else ProductionCalendarDay.DAY_OFF
+            elif kind == XML_WORKDAY:
+                kind = ProductionCalendarDay.WORKDAY
+            else:
+                continue
+            days.append(ProductionCalendarDay(date=date(year, day_month, day_number), kind=kind))
+
+        with transaction.atomic():
+            ProductionCalendarDay.objects.filter(date__year=year).delete()
+            ProductionCalendarDay.objects.bulk_create(days)
+        clear_cache()
+        self.stdout.write(self.style.SUCCESS(f'Календарь {year}: загружено {len(days)} дней'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from vacations.balances import rollover_balances
+
+
+class Command(BaseCommand):
+    help = 'Завести балансы отпусков на новый год для всех активных сотрудников'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Год (по умолчанию — следующий)')
+        parser.add_argument('--total-days', type=float, help='Норма дней на год (по умолчанию 28)')
+        parser.add_argument('--carry-over', action='store_true',
+                            help='Добавить к норме неиспользованный остаток прошлого года')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Сотрудников в одной пачке')
+
+    def handle(self, *args, **options):
+        year = options['year'] or timezone.localdate().year + 1
+        processed = rollover_balances(
+            year,
+            total_days=options['total_days'],
+            carry_over=options['carry_over'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Балансы на {year} год: обработано {processed} сотрудников'))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_employee_onboarding_progress'),
+        ('vacations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='vacation_status_dates_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_employee_department'),
+        ('vacations', '0002_vacationrequest_status_dates_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['-created_at', '-id'], name='vacation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='vacation_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['employee', '-created_at', '-id'], name='vacation_employee_created_idx'),
+        ),
+    ]
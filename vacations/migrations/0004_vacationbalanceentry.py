@@ -0,0 +1,69 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:39
+
+import django.db.models.deletion
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db import migrations, models
+
+
+def backfill_balance_ledger(apps, schema_editor):
+    """Провести уже утвержденные отпуска через журнал и пересчитать used_days с нуля"""
+    VacationRequest = apps.get_model('vacations', 'VacationRequest')
+    VacationBalance = apps.get_model('vacations', 'VacationBalance')
+    VacationBalanceEntry = apps.get_model('vacations', 'VacationBalanceEntry')
+
+    entries = []
+    used = Counter()
+    approved = VacationRequest.objects.filter(status='approved').values_list(
+        'pk', 'employee_id', 'start_date', 'end_date'
+    )
+    for pk, employee_id, start_date, end_date in approved.iterator():
+        current = start_date
+        while current <= end_date:
+            year_end = min(end_date, date(current.year, 12, 31))
+            days = (year_end - current).days + 1
+            entries.append(VacationBalanceEntry(
+                employee_id=employee_id, year=current.year, days=days, reason='approve', vacation_id=pk,
+            ))
+            used[(employee_id, current.year)] += days
+            current = year_end + timedelta(days=1)
+    VacationBalanceEntry.objects.bulk_create(entries, batch_size=500)
+
+    VacationBalance.objects.update(used_days=0)
+    VacationBalance.objects.bulk_create(
+        [VacationBalance(employee_id=employee_id, year=year) for employee_id, year in used],
+        batch_size=500, ignore_conflicts=True,
+    )
+    for (employee_id, year), days in used.items():
+        VacationBalance.objects.filter(employee_id=employee_id, year=year).update(used_days=days)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_employee_department'),
+        ('vacations', '0003_vacationrequest_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VacationBalanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(verbose_name='Год')),
+                ('days', models.FloatField(verbose_name='Изменение использованных дней')),
+                ('reason', models.CharField(choices=[('approve', 'Отпуск утвержден'), ('revoke', 'Утверждение снято')], max_length=20, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vacation_balance_entries', to='users.employee')),
+                ('vacation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balance_entries', to='vacations.vacationrequest')),
+            ],
+            options={
+                'verbose_name': 'Изменение баланса',
+                'verbose_name_plural': 'Журнал балансов',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['employee', 'year'], name='balance_entry_employee_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_balance_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0004_vacationbalanceentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionCalendarDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('kind', models.CharField(choices=[('holiday', 'Нерабочий праздничный день'), ('day_off', 'Выходной (перенос)'), ('workday', 'Рабочий день (перенос)')], max_length=10, verbose_name='Тип дня')),
+            ],
+            options={
+                'verbose_name': 'День производственного календаря',
+                'verbose_name_plural': 'Производственный календарь',
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -22,6 +22,35 @@ class VacationBalance(TimeStampedModel):
         return f"{self.employee.name} - {self.year}: {self.remaining_days()} дней"
 
 
+class VacationBalanceEntry(models.Model):
+    """Запись журнала изменений баланса (только добавляется, не редактируется)"""
+    APPROVE = 'approve'
+    REVOKE = 'revoke'
+    REASON_CHOICES = [
+        (APPROVE, 'Отпуск утвержден'),
+        (REVOKE, 'Утверждение снято'),
+    ]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='vacation_balance_entries')
+    year = models.IntegerField(verbose_name="Год")
+    days = models.FloatField(verbose_name="Изменение использованных дней")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, verbose_name="Причина")
+    vacation = models.ForeignKey('VacationRequest', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='balance_entries')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name = "Изменение баланса"
+        verbose_name_plural = "Журнал балансов"
+        indexes = [
+            models.Index(fields=['employee', 'year'], name='balance_entry_employee_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id}/{self.year}: {self.days:+g} ({self.reason})"
+
+
 class VacationRequest(TimeStampedModel):
     """Заявка на отпуск"""
     STATUS_CHOICES = [
@@ -45,9 +74,45 @@ class VacationRequest(TimeStampedModel):
         ordering = ['-created_at']
         verbose_name = "Заявка на отпуск"
         verbose_name_plural = "Заявки на отпуск"
+        indexes = [
+            # Пересечение с окном календаря: status = ... AND start_date < ... AND end_date >= ...
+            models.Index(fields=['status', 'start_date', 'end_date'], name='vacation_status_dates_idx'),
+            # Курсорная пагинация списка по (created_at, id) — без фильтра, по статусу и по сотруднику
+            models.Index(fields=['-created_at', '-id'], name='vacation_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='vacation_status_created_idx'),
+            models.Index(fields=['employee', '-created_at', '-id'], name='vacation_employee_created_idx'),
+        ]
 
     def days_count(self):
-        return (self.end_date - self.start_date).days + 1
+        """Дни отпуска по производственному календарю (без праздников)"""
+        # Для списков значение заранее считается пачкой (workdays.attach_days_count)
+        if getattr(self, '_days_count', None) is not None:
+            return self._days_count
+        from .workdays import vacation_days
+        return vacation_days(self.start_date, self.end_date)
+
+    def __str__(self):
+        return f"{self.employee.name} - {self.start_date} to {self.end_date}"
+
+
+class ProductionCalendarDay(models.Model):
+    """Исключение производственного календаря из обычной недели (пн–пт рабочие)"""
+    HOLIDAY = 'holiday'
+    DAY_OFF = 'day_off'
+    WORKDAY = 'workday'
+    KIND_CHOICES = [
+        (HOLIDAY, 'Нерабочий праздничный день'),
+        (DAY_OFF, 'Выходной (перенос)'),
+        (WORKDAY, 'Рабочий день (перенос)'),
+    ]
+
+    date = models.DateField(unique=True, verbose_name="Дата")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Тип дня")
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = "День производственного календаря"
+        verbose_name_plural = "Производственный календарь"
 
     def __str__(self):
-        return f"{self.employee.name} - {self.start_date} to {self.end_date}"
\ No newline at end of file
+        return f"{self.date}: {self.get_kind_display()}"
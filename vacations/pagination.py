@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .calendar import MAX_VACATION_DAYS
+
+# ============================================
+# Курсорная (keyset) пагинация и фильтры списка заявок
+# ============================================
+
+PAGE_SIZE = 50
+STATUSES = {'draft', 'pending', 'approved', 'rejected', 'cancelled'}
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    """Курсор — последняя показанная строка: (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{pk}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Разобрать курсор; испорченный курсор — None (первая страница)"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        created_at, pk = raw.rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        return (created_at, int(pk)) if created_at else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def list_filters(params) -> Dict:
+    """Допустимые фильтры из GET: статус, сотрудник, период (пересечение с отпуском)"""
+    filters = {}
+    status = params.get('status')
+    if status in STATUSES:
+        filters['status'] = status
+    employee = params.get('employee')
+    if employee and employee.isdigit():
+        filters['employee'] = int(employee)
+    for name in ('date_from', 'date_to'):
+        try:
+            value = parse_date(params.get(name) or '')
+        except ValueError:
+            value = None
+        if value:
+            filters[name] = value
+    return filters
+
+
+def apply_filters(queryset: QuerySet, filters: Dict) -> QuerySet:
+    if 'status' in filters:
+        queryset = queryset.filter(status=filters['status'])
+    if 'employee' in filters:
+        queryset = queryset.filter(employee_id=filters['employee'])
+    if 'date_to' in filters:
+        queryset = queryset.filter(start_date__lte=filters['date_to'])
+    if 'date_from' in filters:
+        queryset = queryset.filter(
+            end_date__gte=filters['date_from'],
+            start_date__gte=filters['date_from'] - timedelta(days=MAX_VACATION_DAYS),
+        )
+    return queryset
+
+
+def keyset_page(queryset: QuerySet, cursor: Optional[Tuple[datetime, int]],
+                page_size: int = PAGE_SIZE) -> Tuple[list, Optional[str]]:
+    """
+    Страница по убыванию (created_at, id), начиная после курсора.
+
+    Вместо OFFSET условие «строго после последней показанной строки» идет
+    по индексу, поэтому любая страница стоит как первая. Возвращает строки
+    и курсор следующей страницы (None, если она последняя).
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor is not None:
+        created_at, pk = cursor
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+    return rows, next_cursor
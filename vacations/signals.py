@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .balances import approve_entries, post_entries, revoke_entries
+from .models import ProductionCalendarDay, VacationRequest
+from .workdays import clear_cache
+
+# Массовые решения (approvals.decide_vacations) идут UPDATE'ом и проводят
+# журнал сами; здесь — одиночные save() и delete(), например из админки.
+
+
+def _approved_state(pk):
+    """Утвержденная версия заявки из базы (объект в памяти может быть устаревшим) или None"""
+    return (
+        VacationRequest.objects
+        .filter(pk=pk, status='approved')
+        .only('employee', 'start_date', 'end_date')
+        .first()
+    )
+
+
+@receiver(pre_save, sender=VacationRequest)
+def remember_approved_state(sender, instance, raw=False, **kwargs):
+    """Запомнить, была ли заявка утверждена и на какие даты, до сохранения"""
+    instance._approved_before = None
+    if not raw and instance.pk is not None:
+        instance._approved_before = _approved_state(instance.pk)
+
+
+@receiver(post_save, sender=VacationRequest)
+def sync_balance_on_save(sender, instance, raw=False, **kwargs):
+    """Переход в approved списывает дни, выход из него (или смена дат) возвращает"""
+    if raw:
+        return
+    before = getattr(instance, '_approved_before', None)
+    approved_now = instance.status == 'approved'
+    if before is not None and approved_now and (
+        before.employee_id, before.start_date, before.end_date
+    ) == (instance.employee_id, instance.start_date, instance.end_date):
+        return
+
+    entries = []
+    if before is not None:
+        entries += revoke_entries([instance.pk])
+    if approved_now:
+        entries += approve_entries([instance])
+    post_entries(entries)
+
+
+@receiver(pre_delete, sender=VacationRequest)
+def remember_approved_on_delete(sender, instance, origin=None, **kwargs):
+    """Пока заявка и ее журнал на месте, подготовить возврат списанных дней"""
+    instance._revoke_entries = []
+    # При удалении сотрудника журнал и балансы уходят вместе с ним
+    if getattr(origin, 'model', type(origin)) is VacationRequest:
+        instance._revoke_entries = revoke_entries([instance.pk])
+        for entry in instance._revoke_entries:
+            # Заявки не станет, запись журнала остается без ссылки на нее
+            entry.vacation_id = None
+
+
+@receiver(post_delete, sender=VacationRequest)
+def sync_balance_on_delete(sender, instance, **kwargs):
+    """Удаленный утвержденный отпуск возвращает дни"""
+    post_entries(getattr(instance, '_revoke_entries', []))
+
+
+@receiver(post_save, sender=ProductionCalendarDay)
+@receiver(post_delete, sender=ProductionCalendarDay)
+def calendar_changed(sender, **kwargs):
+    clear_cache()
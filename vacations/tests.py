@@ -1,3 +1,259 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import BitrixOutbox
+from users.models import Employee
+from . import approvals, workdays
+from .approvals import APPROVED, NOT_FOUND, NOT_PENDING, OVER_CAPACITY, REJECTED, decide_vacations
+from .ics import feed_token, fold, rotate_feed_key
+from .models import ProductionCalendarDay, VacationBalance, VacationBalanceEntry, VacationRequest
+
+
+class VacationTestCase(TestCase):
+    """Подразделение из четырех сотрудников: одновременно может отсутствовать один"""
+
+    def setUp(self):
+        self.employees = [
+            Employee.objects.create(bitrix_id=index, name=f'Сотрудник {index}', department=7)
+            for index in range(1, 5)
+        ]
+
+    def vacation(self, employee, start, end, status='pending'):
+        return VacationRequest.objects.create(employee=employee, start_date=start, end_date=end, status=status)
+
+    def used_days(self, employee, year):
+        return VacationBalance.objects.get(employee=employee, year=year).used_days
+
+
+class DecideVacationsTests(VacationTestCase):
+
+    def test_approve_posts_ledger_and_outbox(self):
+        # 2–10 ноября 2026: 9 календарных дней, 4 ноября — праздник
+        vacation = self.vacation(self.employees[0], date(2026, 11, 2), date(2026, 11, 10))
+
+        results = decide_vacations([vacation.pk, 999999], APPROVED, decided_by=self.employees[3])
+
+        self.assertEqual(results, {vacation.pk: APPROVED, 999999: NOT_FOUND})
+        vacation.refresh_from_db()
+        self.assertEqual(vacation.approved_by, self.employees[3])
+        self.assertEqual(self.used_days(self.employees[0], 2026), 8)
+        self.assertEqual(
+            list(VacationBalanceEntry.objects.values_list('vacation_id', 'reason', 'days')),
+            [(vacation.pk, VacationBalanceEntry.APPROVE, 8)],
+        )
+        self.assertEqual(BitrixOutbox.objects.count(), 2)
+
+    def test_decided_rows_are_not_pending(self):
+        vacation = self.vacation(self.employees[0], date(2026, 11, 2), date(2026, 11, 3))
+        decide_vacations([vacation.pk], REJECTED)
+
+        self.assertEqual(decide_vacations([vacation.pk], APPROVED), {vacation.pk: NOT_PENDING})
+        self.assertFalse(VacationBalanceEntry.objects.exists())
+
+    def test_overlapping_batch_respects_capacity(self):
+        first = self.vacation(self.employees[0], date(2026, 11, 2), date(2026, 11, 10))
+        second = self.vacation(self.employees[1], date(2026, 11, 9), date(2026, 11, 12))
+        separate = self.vacation(self.employees[2], date(2026, 11, 20), date(2026, 11, 25))
+
+        results = decide_vacations([second.pk, first.pk, separate.pk], APPROVED)
+
+        self.assertEqual(results, {second.pk: APPROVED, first.pk: OVER_CAPACITY, separate.pk: APPROVED})
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'pending')
+        self.assertEqual(decide_vacations([first.pk], APPROVED, force=True), {first.pk: APPROVED})
+
+    def test_row_decided_concurrently_is_not_charged(self):
+        taken = self.vacation(self.employees[0], date(2026, 11, 2), date(2026, 11, 3))
+        free = self.vacation(self.employees[1], date(2026, 11, 20), date(2026, 11, 21))
+        capacity_check = approvals.capacity_check
+
+        def capacity_check_with_race(vacations):
+            # Между чтением и UPDATE заявку отклоняет другой HR
+            VacationRequest.objects.filter(pk=taken.pk).update(status='rejected')
+            return capacity_check(vacations)
+
+        with mock.patch.object(approvals, 'capacity_check', capacity_check_with_race):
+            results = decide_vacations([taken.pk, free.pk], APPROVED)
+
+        self.assertEqual(results, {taken.pk: NOT_PENDING, free.pk: APPROVED})
+        self.assertEqual(list(VacationBalanceEntry.objects.values_list('vacation_id', flat=True)), [free.pk])
+        self.assertEqual(BitrixOutbox.objects.count(), 2)
+
+
+class FoldTests(TestCase):
+
+    def test_long_line_is_folded_by_octets(self):
+        line = 'SUMMARY:' + 'Отпуск ' * 30
+        folded = fold(line)
+        parts = folded[:-2].split('\r\n')
+
+        self.assertTrue(folded.endswith('\r\n'))
+        self.assertGreater(len(parts), 1)
+        self.assertTrue(all(part.startswith(' ') for part in parts[1:]))
+        self.assertTrue(all(len(part.encode('utf-8')) <= 75 for part in parts))
+        # Склейка без пробелов продолжения возвращает исходную строку: символы не разорваны
+        self.assertEqual(parts[0] + ''.join(part[1:] for part in parts[1:]), line)
+
+    def test_short_line_is_kept(self):
+        self.assertEqual(fold('SUMMARY:Отпуск'), 'SUMMARY:Отпуск\r\n')
+
+
+class VacationFeedTests(VacationTestCase):
+    """Личные ссылки на .ics-ленты: проверяются при каждом запросе и отзываются"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.employees[0]
+        self.owner.user = User.objects.create_user('owner', password='secret')
+        self.owner.save()
+        self.vacation(self.owner, date(2026, 11, 2), date(2026, 11, 10), status='approved')
+        self.url = '/vacations/feeds/department/7.ics'
+
+    def get(self, token=None, **extra):
+        return self.client.get(self.url, {'token': token or feed_token(self.owner, 'department', 7)}, **extra)
+
+    def test_token_returns_feed_and_304(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('BEGIN:VEVENT', b''.join(response.streaming_content).decode())
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_without_token_no_304(self):
+        etag = self.get()['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_token_for_other_feed_is_forbidden(self):
+        token = feed_token(self.owner, 'department', 7)
+        response = self.client.get('/vacations/feeds/department/8.ics', {'token': token})
+        self.assertEqual(response.status_code, 403)
+
+    def test_rotated_key_revokes_links(self):
+        token = feed_token(self.owner, 'department', 7)
+        rotate_feed_key(self.owner)
+
+        self.assertEqual(self.get(token).status_code, 403)
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_deactivated_user_is_forbidden(self):
+        token = feed_token(self.owner, 'department', 7)
+        User.objects.filter(pk=self.owner.user_id).update(is_active=False)
+        self.assertEqual(self.get(token).status_code, 403)
+
+    def test_moved_employee_loses_department_feed(self):
+        token = feed_token(self.owner, 'department', 7)
+        Employee.objects.filter(pk=self.owner.pk).update(department=8)
+        self.assertEqual(self.get(token).status_code, 403)
+
+    def test_rotate_view_changes_key(self):
+        self.client.login(username='owner', password='secret')
+        token = feed_token(self.owner, 'department', 7)
+
+        response = self.client.post('/vacations/feeds/rotate/')
+
+        self.assertRedirects(response, '/vacations/calendar/', fetch_redirect_response=False)
+        self.client.logout()
+        self.assertEqual(self.get(token).status_code, 403)
+
+
+class BalanceSignalTests(VacationTestCase):
+    """Одиночные save() и delete() (например, из админки) держат баланс в согласии с журналом"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee = self.employees[0]
+        self.approved = self.vacation(self.employee, date(2026, 11, 2), date(2026, 11, 10), status='approved')
+
+    def assertLedgerMatches(self):
+        for balance in VacationBalance.objects.all():
+            posted = VacationBalanceEntry.objects.filter(employee=balance.employee, year=balance.year)
+            self.assertEqual(balance.used_days, sum(posted.values_list('days', flat=True)))
+
+    def test_status_change_revokes_days(self):
+        self.assertEqual(self.used_days(self.employee, 2026), 8)
+
+        self.approved.status = 'rejected'
+        self.approved.save()
+
+        self.assertEqual(self.used_days(self.employee, 2026), 0)
+        self.assertEqual(
+            list(VacationBalanceEntry.objects.filter(reason=VacationBalanceEntry.REVOKE).values_list('vacation_id', 'days')),
+            [(self.approved.pk, -8)],
+        )
+        self.assertLedgerMatches()
+
+    def test_date_change_reposts_days(self):
+        self.approved.end_date = date(2026, 11, 5)
+        self.approved.save()
+
+        self.assertEqual(self.used_days(self.employee, 2026), 3)
+        self.assertLedgerMatches()
+
+    def test_delete_revokes_days(self):
+        self.approved.delete()
+
+        self.assertEqual(self.used_days(self.employee, 2026), 0)
+        self.assertEqual(
+            list(VacationBalanceEntry.objects.filter(reason=VacationBalanceEntry.REVOKE).values_list('vacation_id', 'days')),
+            [(None, -8)],
+        )
+        self.assertLedgerMatches()
+
+    def test_queryset_delete_revokes_every_year(self):
+        # Через Новый год: 28–31 декабря — 4 дня, 1–10 января — 2 (1–8 января праздники)
+        self.vacation(self.employees[1], date(2026, 12, 28), date(2027, 1, 10), status='approved')
+        self.assertEqual(self.used_days(self.employees[1], 2026), 4)
+        self.assertEqual(self.used_days(self.employees[1], 2027), 2)
+
+        VacationRequest.objects.all().delete()
+
+        self.assertFalse(VacationBalance.objects.exclude(used_days=0).exists())
+        self.assertLedgerMatches()
+
+
+class WorkdaysTests(TestCase):
+    """Подсчет дней через префиксные суммы — с numpy и без него одинаково"""
+
+    starts = [date(2026, 12, 28), date(2026, 12, 31), date(2027, 1, 1), date(2026, 11, 2), date(2027, 1, 10)]
+    ends = [date(2027, 1, 10), date(2027, 1, 1), date(2027, 1, 8), date(2026, 11, 10), date(2027, 1, 9)]
+
+    def setUp(self):
+        workdays.clear_cache()
+
+    def backends(self):
+        for np in {workdays.np, None}:
+            with self.subTest(numpy=np is not None), mock.patch.object(workdays, 'np', np):
+                yield
+
+    def naive(self, start, end):
+        days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        vacation = sum(not workdays.get_year(day.year).is_holiday(day) for day in days)
+        working = sum(workdays.get_year(day.year).is_workday(day) for day in days)
+        return vacation, working
+
+    def test_year_boundary_with_holidays(self):
+        # 28.12.2026–10.01.2027: 14 календарных дней, 1–8 января праздники
+        for _ in self.backends():
+            self.assertEqual(
+                [int(days) for days in workdays.vacation_days_many(self.starts, self.ends)], [6, 1, 0, 8, 0]
+            )
+            self.assertEqual(
+                [int(days) for days in workdays.working_days_many(self.starts, self.ends)], [4, 1, 0, 6, 0]
+            )
+
+    def test_matches_day_by_day_count_with_overrides(self):
+        ProductionCalendarDay.objects.create(date=date(2026, 12, 31), kind=ProductionCalendarDay.HOLIDAY)
+        ProductionCalendarDay.objects.create(date=date(2027, 1, 9), kind=ProductionCalendarDay.WORKDAY)
+        starts = [date(2025, 12, 20) + timedelta(days=offset * 11) for offset in range(40)]
+        ends = [start + timedelta(days=offset * 7) for offset, start in enumerate(starts)]
+
+        expected = [self.naive(start, end) for start, end in zip(starts, ends)]
+        for _ in self.backends():
+            actual = zip(workdays.vacation_days_many(starts, ends), workdays.working_days_many(starts, ends))
+            self.assertEqual([(int(vacation), int(working)) for vacation, working in actual], expected)
+        self.assertEqual(workdays.vacation_days(date(2026, 12, 28), date(2027, 1, 10)), 5)
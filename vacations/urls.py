@@ -10,5 +10,12 @@ urlpatterns = [
     path('calendar/', views.vacation_calendar, name='calendar'),
     path('<int:pk>/approve/', views.vacation_approve, name='approve'),
     path('<int:pk>/reject/', views.vacation_reject, name='reject'),
+    path('bulk/', views.vacation_bulk_decide, name='bulk_decide'),
     path('api/calendar/', views.calendar_api, name='calendar_api'),
+    path('api/availability/', views.availability_api, name='availability_api'),
+    path('feeds/department/<int:object_id>.ics', views.vacation_feed, {'scope': 'department'},
+         name='department_feed'),
+    path('feeds/employee/<int:object_id>.ics', views.vacation_feed, {'scope': 'employee'},
+         name='employee_feed'),
+    path('feeds/rotate/', views.rotate_feed_links, name='rotate_feeds'),
 ]
\ No newline at end of file
@@ -3,27 +3,54 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from users.models import Employee
 from .models import VacationRequest, VacationBalance
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from django.utils import timezone
-from django.http import JsonResponse
+from django.utils.dateparse import parse_date
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from urllib.parse import urlencode
+import json
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST
+from .approvals import APPROVED, NOT_FOUND, NOT_PENDING, OVER_CAPACITY, REJECTED, decide_vacations
+from .balances import get_balance
+from .availability import capacity_violations, colleagues_off, department_availability
+from .pagination import apply_filters, decode_cursor, keyset_page, list_filters
+from .workdays import attach_days_count
+from .ics import (
+    can_read_feed, feed_queryset, feed_state, feed_subscriber, feed_token, iter_calendar, rotate_feed_key,
+)
+from .calendar import MAX_WINDOW_DAYS, calendar_window, iter_events_json, parse_calendar_date, window_state
 
 
 @login_required
 def vacation_list(request):
-    """Список заявок на отпуск"""
+    """Список заявок на отпуск (курсорная пагинация и фильтры)"""
+    filters = list_filters(request.GET)
+    vacations = VacationRequest.objects.select_related('employee', 'approved_by')
+
     # Для HR показываем все заявки, для сотрудника - только свои
-    if request.user.is_staff:
-        vacations = VacationRequest.objects.all().order_by('-created_at')
-    else:
-        # Пытаемся найти сотрудника по связанному пользователю
-        try:
-            employee = Employee.objects.get(user=request.user)
-            vacations = VacationRequest.objects.filter(employee=employee).order_by('-created_at')
-        except Employee.DoesNotExist:
-            vacations = []
+    if not request.user.is_staff:
+        employee = Employee.objects.filter(user=request.user).only('pk').first()
+        if employee is None:
+            return render(request, 'vacations/list.html', {'vacations': [], 'filters': filters})
+        filters['employee'] = employee.pk
+
+    vacations, next_cursor = keyset_page(
+        apply_filters(vacations, filters), decode_cursor(request.GET.get('cursor'))
+    )
+    attach_days_count(vacations)
 
+    query = dict(filters)
+    if not request.user.is_staff:
+        query.pop('employee')
     return render(request, 'vacations/list.html', {
-        'vacations': vacations
+        'vacations': vacations,
+        'filters': filters,
+        'statuses': VacationRequest.STATUS_CHOICES,
+        'is_first_page': 'cursor' not in request.GET,
+        'filter_query': urlencode(query),
+        'next_query': urlencode({**query, 'cursor': next_cursor}) if next_cursor else None,
     })
 
 
@@ -41,7 +68,16 @@ def vacation_create(request):
             employee = Employee.objects.get(user=request.user)
         except Employee.DoesNotExist:
             messages.error(request, 'Сотрудник не найден')
-            return redirect('vacation_list')
+            return redirect('vacations:list')
+
+        try:
+            start_date = parse_date(start_date or '')
+            end_date = parse_date(end_date or '')
+        except ValueError:
+            start_date = end_date = None
+        if not start_date or not end_date or end_date < start_date:
+            messages.error(request, 'Проверьте даты отпуска')
+            return redirect('vacations:create')
 
         # Создаём заявку
         vacation = VacationRequest.objects.create(
@@ -53,9 +89,21 @@ def vacation_create(request):
         )
 
         messages.success(request, 'Заявка на отпуск создана и отправлена на согласование')
-        return redirect('vacation_list')
+        summary = colleagues_off(vacation)
+        if summary and summary['peak']:
+            messages.warning(
+                request,
+                f"В эти даты уже отсутствуют до {summary['peak']} коллег из {summary['team_size'] - 1} "
+                f"(больше всего — {summary['peak_date']:%d.%m.%Y})"
+            )
+        return redirect('vacations:list')
 
-    return render(request, 'vacations/create.html')
+    employee = Employee.objects.filter(user=request.user).only('pk').first()
+    year = timezone.localdate().year
+    return render(request, 'vacations/create.html', {
+        'balance': get_balance(employee.pk, year) if employee else None,
+        'year': year,
+    })
 
 
 @login_required
@@ -70,7 +118,104 @@ def vacation_detail(request, pk):
 @login_required
 def vacation_calendar(request):
     """Календарь отпусков"""
-    return render(request, 'vacations/calendar.html')
+    employee = Employee.objects.filter(user=request.user, is_active=True).only('pk', 'department', 'feed_key').first()
+    feeds = {}
+    if employee:
+        feeds['employee'] = _feed_url(request, employee, 'employee', employee.pk)
+        if employee.department is not None:
+            feeds['department'] = _feed_url(request, employee, 'department', employee.department)
+    return render(request, 'vacations/calendar.html', {'feeds': feeds})
+
+
+@login_required
+@require_POST
+def rotate_feed_links(request):
+    """Перевыпустить ссылки подписки: старые (например, утекшие) перестают работать"""
+    employee = Employee.objects.filter(user=request.user, is_active=True).first()
+    if employee:
+        rotate_feed_key(employee)
+        messages.success(request, 'Ссылки на календарь перевыпущены, старые больше не работают')
+    return redirect('vacations:calendar')
+
+
+def _feed_url(request, employee, scope, object_id):
+    """Личная ссылка на .ics-ленту с подписанным токеном (для календарей без входа в систему)"""
+    url = reverse(f'vacations:{scope}_feed', args=[object_id])
+    token = feed_token(employee, scope, object_id)
+    return request.build_absolute_uri(f'{url}?{urlencode({"token": token})}')
+
+
+def _feed_allowed(request, scope, object_id):
+    """Действующий личный токен или вход в систему: HR видит все ленты, сотрудник — свои"""
+    if feed_subscriber(request.GET.get('token'), scope, object_id) is not None:
+        return True
+    if not request.user.is_authenticated:
+        return False
+    if request.user.is_staff:
+        return True
+    employee = Employee.objects.filter(user=request.user, is_active=True).only('pk', 'department').first()
+    return employee is not None and can_read_feed(employee, scope, object_id)
+
+
+def _feed_state(request, scope, object_id):
+    """Заявки и версия ленты, один раз на запрос"""
+    if not hasattr(request, '_feed_state'):
+        vacations = feed_queryset(scope, object_id)
+        request._feed_state = (vacations, feed_state(vacations))
+    return request._feed_state
+
+
+def _feed_etag(request, object_id, scope):
+    return _feed_state(request, scope, object_id)[1]['etag']
+
+
+def _feed_last_modified(request, object_id, scope):
+    return _feed_state(request, scope, object_id)[1]['last_modified']
+
+
+def vacation_feed(request, object_id, scope):
+    """
+    Лента утвержденных отпусков в iCalendar: подразделение или сотрудник.
+
+    Доступ проверяется до условного GET: без прав нельзя ни получить 304,
+    ни увидеть ETag и Last-Modified ленты.
+    """
+    if not _feed_allowed(request, scope, object_id):
+        return HttpResponseForbidden('Invalid feed token')
+    return _vacation_feed(request, object_id, scope)
+
+
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def _vacation_feed(request, object_id, scope):
+    if scope == 'employee':
+        name = f"Отпуска: {get_object_or_404(Employee.objects.only('name'), pk=object_id).name}"
+    else:
+        name = f'Отпуска подразделения {object_id}'
+
+    vacations, _ = _feed_state(request, scope, object_id)
+    response = StreamingHttpResponse(
+        iter_calendar(vacations, name, request.get_host().split(':')[0]),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'inline; filename="vacations-{scope}-{object_id}.ics"'
+    patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    return response
+
+
+DECISION_MESSAGES = {
+    APPROVED: 'утверждена',
+    REJECTED: 'отклонена',
+    NOT_PENDING: 'уже обработана',
+    NOT_FOUND: 'не найдена',
+    OVER_CAPACITY: 'не утверждена: превышен лимит одновременно отсутствующих в подразделении',
+}
+# Сколько заявок принимает одно массовое решение
+BULK_DECISION_LIMIT = 1000
+
+
+def _decided_by(request):
+    """Сотрудник, принимающий решение (HR без карточки сотрудника — None)"""
+    return Employee.objects.filter(user=request.user).first()
 
 
 @login_required
@@ -78,15 +223,27 @@ def vacation_approve(request, pk):
     """Утверждение заявки (только для HR)"""
     if not request.user.is_staff:
         messages.error(request, 'Нет прав для этого действия')
-        return redirect('vacation_list')
+        return redirect('vacations:list')
 
-    vacation = get_object_or_404(VacationRequest, pk=pk)
-    vacation.status = 'approved'
-    vacation.approved_at = timezone.now()
-    vacation.save()
+    vacation = get_object_or_404(VacationRequest.objects.select_related('employee'), pk=pk)
+    force = bool((request.POST or request.GET).get('force'))
+    violations = [] if force else capacity_violations(vacation)
+    if violations:
+        messages.error(
+            request,
+            f'Превышен лимит одновременно отсутствующих в подразделении: {len(violations)} дн., '
+            f'первый — {violations[0]:%d.%m.%Y}. Для утверждения все равно добавьте ?force=1'
+        )
+        return redirect('vacations:detail', pk=pk)
 
-    messages.success(request, f'Заявка на отпуск для {vacation.employee.name} утверждена')
-    return redirect('vacation_detail', pk=pk)
+    # Лимит проверяется еще раз под блокировкой: коллегу могли утвердить параллельно
+    result = decide_vacations([pk], APPROVED, decided_by=_decided_by(request), force=force)[pk]
+    message = f'Заявка на отпуск для {vacation.employee.name} {DECISION_MESSAGES[result]}'
+    if result == APPROVED:
+        messages.success(request, message)
+    else:
+        messages.warning(request, message)
+    return redirect('vacations:detail', pk=pk)
 
 
 @login_required
@@ -94,30 +251,132 @@ def vacation_reject(request, pk):
     """Отклонение заявки (только для HR)"""
     if not request.user.is_staff:
         messages.error(request, 'Нет прав для этого действия')
-        return redirect('vacation_list')
+        return redirect('vacations:list')
 
-    vacation = get_object_or_404(VacationRequest, pk=pk)
-    vacation.status = 'rejected'
-    vacation.save()
+    vacation = get_object_or_404(VacationRequest.objects.select_related('employee'), pk=pk)
+    result = decide_vacations([pk], REJECTED, decided_by=_decided_by(request))[pk]
+    message = f'Заявка на отпуск для {vacation.employee.name} {DECISION_MESSAGES[result]}'
+    if result == REJECTED:
+        messages.success(request, message)
+    else:
+        messages.warning(request, message)
+    return redirect('vacations:detail', pk=pk)
+
+
+@login_required
+@require_POST
+def vacation_bulk_decide(request):
+    """
+    Массовое утверждение или отклонение (только для HR).
+
+    JSON {"action": "approve" | "reject", "ids": [...], "force": false} — ответ
+    с результатом по каждому ID; обычная форма (action, ids, force) — редирект
+    к списку. Без force заявки сверх лимита отсутствующих не утверждаются.
+    """
+    is_json = request.content_type == 'application/json'
+    if not request.user.is_staff:
+        if is_json:
+            return JsonResponse({'success': False, 'error': 'Forbidden'}, status=403)
+        messages.error(request, 'Нет прав для этого действия')
+        return redirect('vacations:list')
 
-    messages.success(request, f'Заявка на отпуск для {vacation.employee.name} отклонена')
-    return redirect('vacation_detail', pk=pk)
+    try:
+        if is_json:
+            data = json.loads(request.body)
+            action, ids = data['action'], [int(pk) for pk in data['ids']]
+            force = bool(data.get('force'))
+        else:
+            action, ids = request.POST['action'], [int(pk) for pk in request.POST.getlist('ids')]
+            force = bool(request.POST.get('force'))
+        status = {'approve': APPROVED, 'reject': REJECTED}[action]
+    except (ValueError, KeyError, TypeError):
+        if is_json:
+            return JsonResponse({'success': False, 'error': 'Invalid payload'}, status=400)
+        messages.error(request, 'Не выбраны заявки или действие')
+        return redirect('vacations:list')
+    if len(ids) > BULK_DECISION_LIMIT:
+        return JsonResponse(
+            {'success': False, 'error': f'Too many ids (max {BULK_DECISION_LIMIT})'}, status=400
+        )
+
+    results = decide_vacations(ids, status, decided_by=_decided_by(request), force=force)
+    if is_json:
+        return JsonResponse({'success': True, 'results': {str(pk): result for pk, result in results.items()}})
+
+    decided = sum(1 for result in results.values() if result == status)
+    messages.success(request, f'Заявок {DECISION_MESSAGES[status]}: {decided} из {len(results)}')
+    over_capacity = sum(1 for result in results.values() if result == OVER_CAPACITY)
+    if over_capacity:
+        messages.warning(
+            request,
+            f'Не утверждено {over_capacity}: превышен лимит одновременно отсутствующих в подразделении. '
+            f'Чтобы утвердить все равно, отметьте «Сверх лимита отсутствующих»'
+        )
+    if decided + over_capacity < len(results):
+        messages.warning(request, f'Пропущено {len(results) - decided - over_capacity}: уже обработаны или не найдены')
+    return redirect(request.META.get('HTTP_REFERER') or 'vacations:list')
+
+
+@login_required
+def availability_api(request):
+    """API доступности подразделения: сколько коллег отсутствует в каждый день периода"""
+    try:
+        start = parse_calendar_date(request.GET.get('start'))
+        end = parse_calendar_date(request.GET.get('end'))
+    except ValueError:
+        start = end = None
+    if not start or not end or end < start or (end - start).days > MAX_WINDOW_DAYS:
+        return JsonResponse({'error': 'Invalid start/end'}, status=400)
+
+    employee = Employee.objects.filter(user=request.user).only('pk', 'department').first()
+    department = request.GET.get('department')
+    if department is None:
+        department = employee.department if employee else None
+    try:
+        department = int(department)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Department is unknown'}, status=400)
 
+    summary = department_availability(
+        department, start, end, exclude_employee=employee.pk if employee else None
+    )
+    summary['days'] = [
+        {'date': (start + timedelta(days=offset)).isoformat(), 'absent': count}
+        for offset, count in enumerate(summary['days'])
+    ]
+    return JsonResponse(summary)
 
+
+def _calendar_state(request):
+    """Окно и версия ленты, один раз на запрос (нужны и условному GET, и самой view)"""
+    if not hasattr(request, '_calendar_state'):
+        window = calendar_window(request.GET.get('start'), request.GET.get('end'))
+        request._calendar_state = (window, window_state(*window))
+    return request._calendar_state
+
+
+def _calendar_etag(request):
+    try:
+        return _calendar_state(request)[1]['etag']
+    except ValueError:
+        return None
+
+
+def _calendar_last_modified(request):
+    try:
+        return _calendar_state(request)[1]['last_modified']
+    except ValueError:
+        return None
+
+
+@condition(etag_func=_calendar_etag, last_modified_func=_calendar_last_modified)
 def calendar_api(request):
     """API для календаря отпусков (возвращает события в формате FullCalendar)"""
-    vacations = VacationRequest.objects.filter(status='approved')
-
-    events = []
-    for vac in vacations:
-        events.append({
-            'title': f'Отпуск: {vac.employee.name}',
-            'start': vac.start_date.isoformat(),
-            'end': (vac.end_date + timedelta(days=1)).isoformat(),  # +1 день для FullCalendar
-            'color': '#2fc6f6',
-            'textColor': 'white',
-            'url': f'/vacations/{vac.id}/',
-            'description': vac.comment,
-        })
-
-    return JsonResponse(events, safe=False)
\ No newline at end of file
+    try:
+        window, _ = _calendar_state(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start/end'}, status=400)
+
+    response = StreamingHttpResponse(iter_events_json(*window), content_type='application/json')
+    patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,182 @@
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него те же префиксные суммы считаются циклом
+    np = None
+
+from .models import ProductionCalendarDay
+
+# ============================================
+# Производственный календарь: рабочие и отпускные дни
+# ============================================
+# Каждый год хранится компактно: по байту на день (рабочий / праздничный)
+# и префиксные суммы, поэтому число дней на любом отрезке — разность двух
+# элементов. Год строится один раз из обычной недели, праздников ТК РФ
+# (ст. 112) и исключений из ProductionCalendarDay, затем берется из кэша.
+
+# Нерабочие праздничные дни по ст. 112 ТК РФ: (месяц, день)
+STATUTORY_HOLIDAYS = [
+    (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),
+    (2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4),
+]
+
+# Сколько живет год в кэше процесса (правки календаря в других процессах подхватятся за это время)
+CACHE_TTL = 3600
+
+
+class YearCalendar:
+    """Один год: битовые карты рабочих и праздничных дней и префиксные суммы по ним"""
+
+    def __init__(self, year: int, overrides: Dict[date, str]):
+        self.year = year
+        self.first = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - self.first).days
+        self.workday = bytearray(days)
+        self.holiday = bytearray(days)
+
+        statutory = {date(year, month, day) for month, day in STATUTORY_HOLIDAYS}
+        for offset in range(days):
+            day = self.first + timedelta(days=offset)
+            kind = overrides.get(day)
+            if kind is None and day in statutory:
+                kind = ProductionCalendarDay.HOLIDAY
+            if kind == ProductionCalendarDay.HOLIDAY:
+                self.holiday[offset] = 1
+            elif kind == ProductionCalendarDay.WORKDAY or (kind is None and day.weekday() < 5):
+                self.workday[offset] = 1
+
+        self.workday_prefix = _prefix(self.workday)
+        self.holiday_prefix = _prefix(self.holiday)
+
+    def is_workday(self, day: date) -> bool:
+        return bool(self.workday[(day - self.first).days])
+
+    def is_holiday(self, day: date) -> bool:
+        return bool(self.holiday[(day - self.first).days])
+
+
+def _prefix(bitmap: bytearray) -> array:
+    prefix = array('H', [0])
+    total = 0
+    for value in bitmap:
+        total += value
+        prefix.append(total)
+    return prefix
+
+
+_years: Dict[int, Tuple[float, YearCalendar]] = {}
+_lock = threading.Lock()
+
+
+def get_year(year: int) -> YearCalendar:
+    """Календарь года из кэша процесса (исключения читаются из базы одним запросом)"""
+    with _lock:
+        cached = _years.get(year)
+    if cached is not None and time.monotonic() - cached[0] < CACHE_TTL:
+        return cached[1]
+
+    overrides = dict(
+        ProductionCalendarDay.objects
+        .filter(date__year=year)
+        .values_list('date', 'kind')
+    )
+    calendar = YearCalendar(year, overrides)
+    with _lock:
+        _years[year] = (time.monotonic(), calendar)
+    return calendar
+
+
+def clear_cache(**kwargs):
+    """Сбросить кэш календаря (после правки исключений)"""
+    with _lock:
+        _years.clear()
+
+
+def _span_prefix(first_year: int, last_year: int, attribute: str) -> List[int]:
+    """Сквозные префиксные суммы по нескольким годам подряд"""
+    prefix = [0]
+    for year in range(first_year, last_year + 1):
+        year_prefix = getattr(get_year(year), attribute)
+        base = prefix[-1]
+        prefix.extend(base + value for value in year_prefix[1:])
+    return prefix
+
+
+def _count_many(starts: Sequence[date], ends: Sequence[date], attribute: str):
+    """
+    Число отмеченных дней на отрезках [start, end] для массивов дат.
+
+    Префиксные суммы строятся один раз на все покрытые годы, дальше каждый
+    отрезок — разность двух элементов; с numpy это одна векторная операция.
+    Пустой отрезок (end < start) дает 0.
+    """
+    if len(starts) != len(ends):
+        raise ValueError('starts и ends должны быть одной длины')
+    if not len(starts):
+        return np.zeros(0, dtype=np.int64) if np is not None else []
+
+    first_year = min(starts).year
+    last_year = max(ends).year
+    if last_year < first_year:
+        last_year = first_year
+    prefix = _span_prefix(first_year, last_year, attribute)
+    base = date(first_year, 1, 1).toordinal()
+    limit = len(prefix) - 1
+
+    if np is not None:
+        prefix = np.asarray(prefix, dtype=np.int64)
+        lo = np.clip(np.fromiter((day.toordinal() for day in starts), dtype=np.int64, count=len(starts)) - base, 0, limit)
+        hi = np.clip(np.fromiter((day.toordinal() for day in ends), dtype=np.int64, count=len(ends)) - base + 1, 0, limit)
+        return np.maximum(prefix[hi] - prefix[lo], 0)
+
+    counts = []
+    for start, end in zip(starts, ends):
+        lo = min(max(start.toordinal() - base, 0), limit)
+        hi = min(max(end.toordinal() - base + 1, 0), limit)
+        counts.append(max(prefix[hi] - prefix[lo], 0))
+    return counts
+
+
+def working_days_many(starts: Sequence[date], ends: Sequence[date]):
+    """Рабочие дни на отрезках [start, end] — для тысяч заявок одним вызовом"""
+    return _count_many(starts, ends, 'workday_prefix')
+
+
+def vacation_days_many(starts: Sequence[date], ends: Sequence[date]):
+    """
+    Дни отпуска на отрезках [start, end]: календарные дни без нерабочих
+    праздничных (ст. 120 ТК РФ).
+    """
+    holidays = _count_many(starts, ends, 'holiday_prefix')
+    if np is not None:
+        calendar_days = (
+            np.fromiter((day.toordinal() for day in ends), dtype=np.int64, count=len(ends))
+            - np.fromiter((day.toordinal() for day in starts), dtype=np.int64, count=len(starts)) + 1
+        )
+        return np.maximum(calendar_days, 0) - holidays
+    return [
+        max((end - start).days + 1, 0) - holiday
+        for start, end, holiday in zip(starts, ends, holidays)
+    ]
+
+
+def working_days(start: date, end: date) -> int:
+    return int(working_days_many([start], [end])[0])
+
+
+def vacation_days(start: date, end: date) -> int:
+    return int(vacation_days_many([start], [end])[0])
+
+
+def attach_days_count(vacations: Iterable) -> list:
+    """Посчитать days_count для списка заявок одним вызовом и запомнить в объектах"""
+    vacations = list(vacations)
+    counts = vacation_days_many([v.start_date for v in vacations], [v.end_date for v in vacations])
+    for vacation, count in zip(vacations, counts):
+        vacation._days_count = int(count)
+    return vacations